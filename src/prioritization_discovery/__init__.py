@@ -1 +1 @@
-__all__ = ["discovery", "config", "rules"]
+__all__ = ["asynchronous", "cli", "discovery", "config", "event_log", "rules"]
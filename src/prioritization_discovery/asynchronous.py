@@ -0,0 +1,273 @@
+import asyncio
+import inspect
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional, Union
+
+import pandas as pd
+
+from .config import DEFAULT_CSV_IDS, EventLogIDs
+from .discovery import (
+    _discover_group_rules,
+    _discover_observations,
+    _queried_attributes,
+    _rules_discovery_stats,
+    _split_groups,
+)
+from .event_log import read_event_log
+from .rules import _iterate_models, _to_priority_level
+from .spill import DEFAULT_BATCH_SIZE
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+
+async def discover_priority_rules_async(
+    event_log: Union[pd.DataFrame, str, Path, "pa.Table"],
+    attributes: list[str],
+    log_ids: EventLogIDs = DEFAULT_CSV_IDS,
+    n_jobs: int = 1,
+    max_levels: Optional[int] = None,
+    spill_dir: Optional[Union[str, Path]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    backend: str = "pandasql",
+    tune: bool = False,
+    quality: bool = False,
+    prune: bool = True,
+    group_by: Optional[str] = None,
+    executor: Optional[Executor] = None,
+    on_progress: Optional[Callable[[dict], None]] = None,
+    stats: Optional[dict] = None,
+) -> Union[list, dict]:
+    """
+    Asynchronous version of discover_priority_rules(), to run the discovery without blocking the event loop (e.g., in a service
+    handling several requests concurrently). Each stage (reading the event log, computing the prioritizations, and discovering the
+    rules of each priority level, or of each group if grouping) is run in [executor], reporting its progress through
+    [on_progress] once finished.
+
+    The discovery can be cancelled by cancelling the task awaiting this coroutine. If cancelled while a stage is running, the
+    stage finishes in the background (it cannot be interrupted), but no further priority level (or group) is discovered, and the
+    resources of the discovery (shared memory and worker processes) are released once it finishes.
+
+    :param event_log:   event log to analyze, either as a pd.DataFrame, the path to a CSV or Parquet file, or a pyarrow.Table.
+    :param attributes:  list of column names for the attributes to use as features for the prioritization (the case attributes).
+    :param log_ids:     mapping for the column IDs of the event log.
+    :param n_jobs:      number of worker processes to use in the rule discovery (1 to run sequentially).
+    :param max_levels:  maximum number of priority levels to discover (None for no limit).
+    :param spill_dir:   if not None, directory where to create the temporary files to compute the prioritizations on disk.
+    :param batch_size:  number of rows to fetch at a time from the database engine when spilling to disk.
+    :param backend:     engine to compute the prioritizations: 'pandasql' (SQLite) or 'duckdb'.
+    :param tune:        if True, choose the 'max_depth' and 'min_weight_fraction_leaf' of the decision trees with a cross-validation.
+    :param quality:     if True, add to each level a dict ('quality') with the support, confidence, and lift of its rules.
+    :param prune:       if True, remove beforehand the activity instances that cannot be part of any prioritization.
+    :param group_by:    if not None, column of the event log to split the observations by, discovering the priority levels of
+                        each group independently (see discover_priority_rules()).
+    :param executor:    thread-based executor where to run the stages (None to use the default executor of the event loop).
+    :param on_progress: if not None, function (or coroutine function) called with a dict describing each finished stage: its
+                        name ('stage'), its runtime in seconds ('runtime'), and its results (e.g., 'priority_level').
+    :param stats:       if not None, dict to fill with statistics of the execution (see discover_priority_rules()).
+
+    :return: a list of dicts with the priority level and the corresponding rules. If grouping, a dict with each group value as key
+    and the list of its priority levels as value.
+    """
+    loop = asyncio.get_running_loop()
+    # Read the needed columns (and the grouping one) if the event log is not already in memory
+    queried_attributes = _queried_attributes(attributes, group_by)
+    if not isinstance(event_log, pd.DataFrame):
+        start = time.perf_counter()
+        event_log = await loop.run_in_executor(
+            executor, partial(read_event_log, event_log, queried_attributes, log_ids)
+        )
+        await _notify(
+            on_progress,
+            {"stage": "read_event_log", "runtime": time.perf_counter() - start, "num_events": len(event_log)},
+        )
+    # Discover the activity instances that have been prioritized w.r.t. others.
+    outcome = "outcome"
+    start = time.perf_counter()
+    prioritized_instances, weight, instances_stats = await loop.run_in_executor(
+        executor,
+        partial(
+            _discover_observations,
+            event_log,
+            queried_attributes,
+            outcome,
+            log_ids,
+            spill_dir,
+            batch_size,
+            backend,
+            prune,
+        ),
+    )
+    runtime = time.perf_counter() - start
+    if stats is not None:
+        stats.update(instances_stats, prioritized_instances_runtime=runtime)
+    await _notify(on_progress, {"stage": "prioritized_instances", "runtime": runtime, **instances_stats})
+    # Discover the priority levels and rules that classify a case in its level.
+    start = time.perf_counter()
+    if group_by is None:
+        priority_rules = await _discover_levels(
+            loop,
+            executor,
+            prioritized_instances,
+            outcome,
+            n_jobs,
+            max_levels,
+            weight,
+            tune,
+            quality,
+            on_progress,
+            stats,
+        )
+    else:
+        priority_rules = await _discover_groups(
+            loop,
+            executor,
+            _split_groups(prioritized_instances, group_by, outcome, group_by in attributes),
+            outcome,
+            n_jobs,
+            max_levels,
+            weight,
+            tune,
+            quality,
+            on_progress,
+        )
+    runtime = time.perf_counter() - start
+    rules_stats = _rules_discovery_stats(priority_rules)
+    if stats is not None:
+        stats.update(rules_stats, rules_discovery_runtime=runtime)
+    await _notify(on_progress, {"stage": "rules_discovery", "runtime": runtime, **rules_stats})
+    # Return rules
+    return priority_rules
+
+
+async def _discover_levels(
+    loop: asyncio.AbstractEventLoop,
+    executor: Optional[Executor],
+    prioritized_instances: pd.DataFrame,
+    outcome: str,
+    n_jobs: int,
+    max_levels: Optional[int],
+    weight: Optional[str],
+    tune: bool,
+    quality: bool,
+    on_progress: Optional[Callable[[dict], None]],
+    stats: Optional[dict],
+) -> list:
+    """
+    Discover, one at a time in [executor], the priority levels and rules of the observations, reporting each of them.
+    """
+    pool = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+    levels = _iterate_models(prioritized_instances, outcome, max_levels, weight, tune, None, stats, pool)
+    priority_levels = []
+    step = None
+    try:
+        while True:
+            start = time.perf_counter()
+            step = loop.run_in_executor(executor, next, levels, None)
+            # Shield the step, so a cancellation does not leave the generator running unattended
+            level = await asyncio.shield(step)
+            step = None
+            if level is None:
+                break
+            model, model_quality = level
+            priority_levels += [
+                _to_priority_level(len(priority_levels) + 1, model, model_quality if quality else None)
+            ]
+            await _notify(
+                on_progress,
+                {
+                    "stage": "priority_level",
+                    "runtime": time.perf_counter() - start,
+                    "priority_level": len(priority_levels),
+                    "num_rules": len(model),
+                },
+            )
+    finally:
+        release = partial(_release, levels, pool)
+        if step is not None and not step.done():
+            # Cancelled while discovering a level: release the resources once it finishes
+            step.add_done_callback(lambda _: release())
+        else:
+            release()
+    return priority_levels
+
+
+async def _discover_groups(
+    loop: asyncio.AbstractEventLoop,
+    executor: Optional[Executor],
+    groups: dict,
+    outcome: str,
+    n_jobs: int,
+    max_levels: Optional[int],
+    weight: Optional[str],
+    tune: bool,
+    quality: bool,
+    on_progress: Optional[Callable[[dict], None]],
+) -> dict:
+    """
+    Discover the priority levels and rules of each group of observations, distributing them among [n_jobs] worker processes (or
+    one at a time in [executor] if n_jobs is 1), and reporting each group once finished.
+    """
+    discover = partial(
+        _discover_group_rules, outcome=outcome, max_levels=max_levels, weight=weight, tune=tune, quality=quality
+    )
+    pool = ProcessPoolExecutor(max_workers=min(n_jobs, len(groups))) if n_jobs > 1 and len(groups) > 1 else None
+    priority_rules = {}
+    start = time.perf_counter()
+    try:
+        if pool is not None:
+            # Discover all the groups in parallel, reporting them as they finish
+            pending = {asyncio.wrap_future(pool.submit(discover, data, n_jobs=1)): group for group, data in groups.items()}
+            while len(pending) > 0:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    group = pending.pop(future)
+                    priority_rules[group] = future.result()
+                    await _notify(on_progress, _group_event(group, priority_rules[group], start))
+                    start = time.perf_counter()
+        else:
+            # Discover the groups one at a time
+            for group, data in groups.items():
+                priority_rules[group] = await loop.run_in_executor(executor, partial(discover, data, n_jobs=n_jobs))
+                await _notify(on_progress, _group_event(group, priority_rules[group], start))
+                start = time.perf_counter()
+    finally:
+        if pool is not None:
+            # Cancel the groups not started yet (if cancelled), without waiting for the running ones
+            pool.shutdown(wait=False, cancel_futures=True)
+    # Return the groups in their original order
+    return {group: priority_rules[group] for group in groups}
+
+
+def _group_event(group, priority_levels: list, start: float) -> dict:
+    """
+    Build the progress event of a finished group (with the time since the previous event as runtime).
+    """
+    return {
+        "stage": "group",
+        "runtime": time.perf_counter() - start,
+        "group": group,
+        "num_priority_levels": len(priority_levels),
+    }
+
+
+async def _notify(on_progress: Optional[Callable[[dict], None]], event: dict):
+    """
+    Report a progress event, awaiting the callback if it is a coroutine function.
+    """
+    if on_progress is not None:
+        result = on_progress(event)
+        if inspect.isawaitable(result):
+            await result
+
+
+def _release(levels, pool: Optional[ProcessPoolExecutor]):
+    """
+    Stop the discovery of priority levels (releasing its shared memory) and the worker processes.
+    """
+    levels.close()
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
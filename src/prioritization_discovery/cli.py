@@ -0,0 +1,162 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from .config import DEFAULT_CSV_IDS, EventLogIDs
+from .discovery import BACKENDS, discover_priority_rules
+from .event_log import read_event_log
+from .spill import DEFAULT_BATCH_SIZE
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    """
+    Command-line entry point: read an event log (CSV or Parquet), discover its priority levels and rules, and write them to
+    a JSON file, together with an (optional) report of the runtime and memory usage of the execution.
+
+    :param args: list of command-line arguments (None to use the ones from sys.argv).
+
+    :return: the exit code of the execution.
+    """
+    parsed_args = _build_parser().parse_args(args)
+    log_ids = EventLogIDs(
+        case=parsed_args.case_id,
+        activity=parsed_args.activity,
+        start_time=parsed_args.start_time,
+        end_time=parsed_args.end_time,
+        resource=parsed_args.resource,
+        enabled_time=parsed_args.enabled_time,
+    )
+    group_by = {"resource": log_ids.resource, "activity": log_ids.activity}.get(parsed_args.group_by)
+    stats = {}
+    # Read event log
+    start = time.perf_counter()
+    event_log = read_event_log(
+        parsed_args.event_log, parsed_args.attributes + ([group_by] if group_by is not None else []), log_ids
+    )
+    stats["read_runtime"] = time.perf_counter() - start
+    stats["num_events"] = len(event_log)
+    # Discover priority levels and rules
+    start = time.perf_counter()
+    priority_rules = discover_priority_rules(
+        event_log=event_log,
+        attributes=parsed_args.attributes,
+        log_ids=log_ids,
+        n_jobs=parsed_args.n_jobs,
+        max_levels=parsed_args.max_levels,
+        spill_dir=parsed_args.spill_dir,
+        batch_size=parsed_args.batch_size,
+        backend=parsed_args.backend,
+        tune=parsed_args.tune,
+        quality=parsed_args.quality,
+        prune=parsed_args.prune,
+        group_by=group_by,
+        stats=stats,
+    )
+    stats["discovery_runtime"] = time.perf_counter() - start
+    stats["peak_memory_mb"] = _peak_memory_mb()
+    stats["peak_worker_memory_mb"] = _peak_memory_mb(children=True)
+    # Write output files (with the group values as keys if grouping)
+    if group_by is not None:
+        priority_rules = {str(group): levels for group, levels in priority_rules.items()}
+    _write_json(priority_rules, parsed_args.output)
+    if parsed_args.report is not None:
+        _write_json(stats, parsed_args.report)
+    return 0
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="prioritization-discovery",
+        description="Discover, from an event log, the priority levels of the process cases and the rules to classify them.",
+    )
+    parser.add_argument("event_log", type=Path, help="path to the event log (CSV, or Parquet with .parquet extension).")
+    parser.add_argument(
+        "-a", "--attributes", nargs="+", required=True, help="columns of the attributes to use as features of the rules."
+    )
+    parser.add_argument("-o", "--output", type=Path, required=True, help="path to write the discovered rules (JSON).")
+    parser.add_argument(
+        "-q",
+        "--quality",
+        action="store_true",
+        help="add the support, confidence, lift, and covered observations of the rules of each level to the output.",
+    )
+    parser.add_argument(
+        "-g",
+        "--group-by",
+        choices=["resource", "activity"],
+        default=None,
+        help="discover the priority levels of each resource or activity independently (output as a JSON object per group).",
+    )
+    parser.add_argument("-r", "--report", type=Path, default=None, help="path to write the runtime/memory report (JSON).")
+    # Column mapping
+    columns = parser.add_argument_group("column mapping")
+    columns.add_argument("--case-id", default=DEFAULT_CSV_IDS.case, help="column with the case ID.")
+    columns.add_argument("--activity", default=DEFAULT_CSV_IDS.activity, help="column with the activity name.")
+    columns.add_argument("--start-time", default=DEFAULT_CSV_IDS.start_time, help="column with the start time.")
+    columns.add_argument("--end-time", default=DEFAULT_CSV_IDS.end_time, help="column with the end time.")
+    columns.add_argument("--resource", default=DEFAULT_CSV_IDS.resource, help="column with the resource.")
+    columns.add_argument("--enabled-time", default=DEFAULT_CSV_IDS.enabled_time, help="column with the enabled time.")
+    # Performance
+    performance = parser.add_argument_group("performance")
+    performance.add_argument(
+        "-j", "--n-jobs", type=int, default=1, help="number of worker processes for the rule discovery (default: 1)."
+    )
+    performance.add_argument(
+        "--max-levels", type=int, default=None, help="maximum number of priority levels to discover (default: no limit)."
+    )
+    performance.add_argument(
+        "--tune",
+        action="store_true",
+        help="tune the depth and leaf weight of the decision trees with cross-validation (reported as 'tree_params').",
+    )
+    performance.add_argument(
+        "--no-prune",
+        dest="prune",
+        action="store_false",
+        help="do not remove beforehand the events that cannot be part of any prioritization (reported as 'num_pruned_events').",
+    )
+    performance.add_argument(
+        "--backend",
+        choices=sorted(BACKENDS),
+        default="pandasql",
+        help="engine to compute the prioritizations (default: %(default)s).",
+    )
+    performance.add_argument(
+        "--spill-dir",
+        type=Path,
+        default=None,
+        help="directory to compute (and aggregate) the prioritizations on disk instead of keeping them in memory.",
+    )
+    performance.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="number of rows to fetch at a time from the database engine when spilling to disk (default: %(default)s).",
+    )
+    return parser
+
+
+def _write_json(content, path: Path):
+    with open(path, "w") as output_file:
+        json.dump(content, output_file, indent=4, default=str)
+
+
+def _peak_memory_mb(children: bool = False) -> Optional[float]:
+    """
+    Get the peak memory (resident set size) used by the process, in MB, or None if it cannot be measured in this platform. If
+    [children], get instead the one of the largest (terminated) child process, i.e., of the worker processes when n_jobs > 1.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports it in KB, macOS in bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,3 +23,5 @@ DEFAULT_CSV_IDS = EventLogIDs(
 # Prefixes for internal use in prioritization discovery
 PRIORITIZED_PREFIX = "prioritized"
 DELAYED_PREFIX = "delayed"
+# Column for internal use with the number of occurrences of each prioritization (when aggregated)
+WEIGHT_COLUMN = "__weight__"
@@ -1,32 +1,248 @@
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional, Union
+
+import numpy as np
 import pandas as pd
 import pandasql as ps
 
-from .config import DELAYED_PREFIX, PRIORITIZED_PREFIX
+from .config import DEFAULT_CSV_IDS, DELAYED_PREFIX, PRIORITIZED_PREFIX, WEIGHT_COLUMN, EventLogIDs
+from .event_log import _needed_columns, read_event_log
 from .rules import discover_prioritization_rules
+from .spill import DEFAULT_BATCH_SIZE, aggregated_prioritizations_query, concat_batches
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# Engines available to compute the prioritizations (pairs of delayed and prioritized activity instances)
+BACKENDS = {"pandasql", "duckdb"}
 
 
-def discover_priority_rules(event_log: pd.DataFrame, attributes: list[str]) -> list:
+def discover_priority_rules(
+    event_log: Union[pd.DataFrame, str, Path, "pa.Table"],
+    attributes: list[str],
+    log_ids: EventLogIDs = DEFAULT_CSV_IDS,
+    n_jobs: int = 1,
+    max_levels: Optional[int] = None,
+    spill_dir: Optional[Union[str, Path]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    backend: str = "pandasql",
+    tune: bool = False,
+    quality: bool = False,
+    prune: bool = True,
+    group_by: Optional[str] = None,
+    stats: Optional[dict] = None,
+) -> Union[list, dict]:
     """
     Given an event log and the list of case attributes to consider, discover the different priority levels and the corresponding rules. The
     priority levels establish a hierarchy in the prioritization when executed the activities in a process. For example, the activity
     instances of a case with a high priority, when enabled, would be executed before the enabled activities of a case with lower priority.
 
-    :param event_log:   event log to analyze.
+    :param event_log:   event log to analyze, either as a pd.DataFrame, the path to a CSV or Parquet file, or a pyarrow.Table. In the
+                        latter cases, only the columns needed for the discovery are read.
     :param attributes:  list of column names for the attributes to use as features for the prioritization (the case attributes).
+    :param log_ids:     mapping for the column IDs of the event log.
+    :param n_jobs:      number of worker processes to use in the rule discovery (1 to run sequentially).
+    :param max_levels:  maximum number of priority levels to discover (None for no limit).
+    :param spill_dir:   if not None, directory where to create the temporary files to compute the prioritizations on disk instead of
+                        keeping them in memory. The identical prioritizations are aggregated (with their number of occurrences as
+                        weight) by the database engine, so only the distinct ones must fit in memory.
+    :param batch_size:  number of rows to fetch at a time from the database engine when spilling to disk. It only bounds the
+                        fetch buffers: all the distinct prioritizations are then loaded (and encoded) in memory at once.
+    :param backend:     engine to compute the prioritizations: 'pandasql' (SQLite) or 'duckdb' (embedded, multi-threaded, and
+                        able to spill to disk the intermediate results of the join; requires the 'duckdb' extra).
+    :param tune:        if True, choose the 'max_depth' and 'min_weight_fraction_leaf' of the decision trees with a (parallel, if n_jobs > 1)
+                        cross-validation over the observations, balancing the confidence of the rules with their size and runtime.
+    :param quality:     if True, add to each level a dict ('quality') with the support, confidence, and lift of its rules, and the
+                        number of prioritized and delayed observations they cover.
+    :param prune:       if True, remove beforehand the activity instances that cannot be part of any prioritization (their waiting
+                        interval neither contains nor is contained in the one of another instance of the same resource), reducing
+                        the input of the pairwise join without altering its result.
+    :param group_by:    if not None, column of the event log (e.g., log_ids.resource or log_ids.activity) to split the observations
+                        by, discovering the priority levels of each group independently (in parallel if n_jobs > 1). Each
+                        prioritization (both of its observations) is assigned to the group of its prioritized activity instance, and
+                        those with a missing value are discarded.
+    :param stats:       if not None, dict to fill with statistics of the execution (runtime of each stage, number of pruned events
+                        and observations, and chosen decision tree hyperparameters if tuning).
 
-    :return: a list of dicts with the priority level and the corresponding rules.
+    :return: a list of dicts with the priority level and the corresponding rules. If grouping, a dict with each group value as key
+    and the list of its priority levels as value.
     """
+    # Read the needed columns (and the grouping one) if the event log is not already in memory
+    queried_attributes = _queried_attributes(attributes, group_by)
+    if not isinstance(event_log, pd.DataFrame):
+        event_log = read_event_log(event_log, queried_attributes, log_ids)
     # Discover the activity instances that have been prioritized w.r.t. others.
     outcome = "outcome"
-    prioritized_instances = _discover_prioritized_instances(event_log, attributes, outcome)
+    start = time.perf_counter()
+    prioritized_instances, weight, instances_stats = _discover_observations(
+        event_log, queried_attributes, outcome, log_ids, spill_dir, batch_size, backend, prune
+    )
+    if stats is not None:
+        stats.update(instances_stats, prioritized_instances_runtime=time.perf_counter() - start)
     # Discover the priority levels and rules that classify a case in its level.
-    priority_rules = discover_prioritization_rules(prioritized_instances, outcome)
+    start = time.perf_counter()
+    if group_by is None:
+        priority_rules = discover_prioritization_rules(
+            prioritized_instances, outcome, n_jobs, max_levels, weight, tune=tune, quality=quality, stats=stats
+        )
+    else:
+        priority_rules = _discover_grouped_prioritization_rules(
+            _split_groups(prioritized_instances, group_by, outcome, group_by in attributes),
+            outcome,
+            n_jobs,
+            max_levels,
+            weight,
+            tune,
+            quality,
+        )
+    if stats is not None:
+        stats.update(_rules_discovery_stats(priority_rules), rules_discovery_runtime=time.perf_counter() - start)
     # Return rules
     return priority_rules
 
 
+def _queried_attributes(attributes: list[str], group_by: Optional[str] = None) -> list[str]:
+    """
+    Get the attributes to retrieve for each observation: the given ones, plus the grouping column (if any, and not among them).
+    """
+    return attributes if group_by is None or group_by in attributes else attributes + [group_by]
+
+
+def _discover_observations(
+    event_log: pd.DataFrame,
+    attributes: list[str],
+    outcome: str = "outcome",
+    log_ids: EventLogIDs = DEFAULT_CSV_IDS,
+    spill_dir: Optional[Union[str, Path]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    backend: str = "pandasql",
+    prune: bool = True,
+) -> tuple[pd.DataFrame, Optional[str], dict]:
+    """
+    Prune (if needed) the event log, and discover the observations (delayed and prioritized activity instances) to learn the
+    rules from, weighted (by the number of occurrences of each prioritization) if spilling to disk.
+
+    :return: a tuple with the pd.DataFrame with the observations, the ID of their weight column (None if not weighted), and a
+    dict with the statistics of the stage (number of pruned events and of observations).
+    """
+    # Ensure the attributes do not collide with the columns added to the observations
+    reserved = [column for column in (outcome, WEIGHT_COLUMN) if column in attributes]
+    if len(reserved) > 0:
+        raise ValueError("The attributes {} collide with reserved column names, rename them.".format(reserved))
+    weight = WEIGHT_COLUMN if spill_dir is not None else None
+    stats = {}
+    if prune:
+        num_events = len(event_log)
+        event_log = _prune_event_log(event_log, log_ids)
+        stats["num_pruned_events"] = num_events - len(event_log)
+    prioritized_instances = _discover_prioritized_instances(
+        event_log, attributes, outcome, log_ids, spill_dir, batch_size, weight, backend
+    )
+    stats["num_observations"] = len(prioritized_instances) if weight is None else int(prioritized_instances[weight].sum())
+    return prioritized_instances, weight, stats
+
+
+def _rules_discovery_stats(priority_rules: Union[list, dict]) -> dict:
+    """
+    Get the statistics of the discovered priority levels (their number, and the number of groups if grouping).
+    """
+    if isinstance(priority_rules, dict):
+        return {
+            "num_groups": len(priority_rules),
+            "num_priority_levels": sum(len(levels) for levels in priority_rules.values()),
+        }
+    return {"num_priority_levels": len(priority_rules)}
+
+
+def _split_groups(prioritized_instances: pd.DataFrame, group_by: str, outcome: str, keep_group: bool = False) -> dict:
+    """
+    Split the observations by the value of [group_by] of the prioritized activity instance of each prioritization, keeping its
+    two observations together (otherwise, the rules of each group could not compare the prioritized instance with the delayed
+    one). The prioritizations with a missing value are discarded.
+
+    :param prioritized_instances:   pd.DataFrame with the observations of delayed and prioritized activity instances (the two
+                                    observations of the same prioritization share the index).
+    :param group_by:                ID of the column to split the observations by.
+    :param outcome:                 ID of the column with the variable to predict (1 positive, 0 negative).
+    :param keep_group:              if True, keep [group_by] as a feature of the rules (otherwise, it is not an attribute).
+
+    :return: a dict with each group value as key, and the pd.DataFrame with its observations as value.
+    """
+    # Get, for each observation, the value of the prioritized activity instance of its prioritization
+    prioritized = prioritized_instances.loc[prioritized_instances[outcome] == 1, group_by]
+    keys = prioritized.loc[prioritized_instances.index].to_numpy()
+    return {
+        group: data if keep_group else data.drop(columns=[group_by])
+        for group, data in prioritized_instances.groupby(keys, sort=True)
+    }
+
+
+def _discover_grouped_prioritization_rules(
+    groups: dict,
+    outcome: str,
+    n_jobs: int = 1,
+    max_levels: Optional[int] = None,
+    weight: Optional[str] = None,
+    tune: bool = False,
+    quality: bool = False,
+) -> dict:
+    """
+    Discover the priority levels and rules of each group of observations independently, distributing the groups among [n_jobs]
+    worker processes (each of them discovering the levels of a group sequentially).
+
+    :param groups:      dict with each group value as key, and the pd.DataFrame with its observations as value.
+    :param outcome:     ID of the column with the variable to predict (1 positive, 0 negative).
+    :param n_jobs:      number of worker processes to discover the rules of the groups (1 to run sequentially).
+    :param max_levels:  maximum number of priority levels to discover in each group (None for no limit).
+    :param weight:      if not None, ID of the column with the weight of each observation.
+    :param tune:        if True, tune the decision tree hyperparameters of each group.
+    :param quality:     if True, add to each level a dict ('quality') with the quality measures of its rules.
+
+    :return: a dict with each group value as key, and the list of its priority levels and rules as value.
+    """
+    # Discover the priority levels of each group, in parallel if needed
+    if n_jobs > 1 and len(groups) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(groups))) as executor:
+            futures = {
+                group: executor.submit(_discover_group_rules, data, outcome, 1, max_levels, weight, tune, quality)
+                for group, data in groups.items()
+            }
+            return {group: future.result() for group, future in futures.items()}
+    return {
+        group: _discover_group_rules(data, outcome, n_jobs, max_levels, weight, tune, quality)
+        for group, data in groups.items()
+    }
+
+
+def _discover_group_rules(
+    data: pd.DataFrame,
+    outcome: str,
+    n_jobs: int = 1,
+    max_levels: Optional[int] = None,
+    weight: Optional[str] = None,
+    tune: bool = False,
+    quality: bool = False,
+) -> list:
+    """
+    Discover the priority levels and rules of a group of observations (see discover_prioritization_rules()).
+    """
+    return discover_prioritization_rules(data, outcome, n_jobs, max_levels, weight, tune=tune, quality=quality)
+
+
 def _discover_prioritized_instances(
-    event_log: pd.DataFrame, attributes: list[str], outcome: str = "outcome"
+    event_log: pd.DataFrame,
+    attributes: list[str],
+    outcome: str = "outcome",
+    log_ids: EventLogIDs = DEFAULT_CSV_IDS,
+    spill_dir: Optional[Union[str, Path]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    weight: Optional[str] = WEIGHT_COLUMN,
+    backend: str = "pandasql",
 ) -> pd.DataFrame:
     """
     Discover activity instances that are prioritized over others. This means they are not being executed following a FIFO order, i.e., in
@@ -34,40 +250,246 @@ def _discover_prioritized_instances(
 
     :param event_log:   event log to analyze.
     :param attributes:  list of column names for the attributes to use as features for the prioritization.
+    :param outcome:     ID of the column with the variable to predict (1 positive, 0 negative).
+    :param log_ids:     mapping for the column IDs of the event log.
+    :param spill_dir:   if not None, directory where to create the temporary files to spill the prioritizations to disk.
+    :param batch_size:  number of rows to fetch at a time from the database engine when spilling to disk. It only bounds the
+                        fetch buffers: all the distinct prioritizations are then loaded (and encoded) in memory at once.
+    :param weight:      ID of the column to store the number of occurrences of each prioritization when spilling to disk.
+    :param backend:     engine to compute the prioritizations, either 'pandasql' (SQLite) or 'duckdb'.
 
-    :return: a pd.DataFrame with each of the observations (positive and negative) of prioritization found in the event log.
+    :return: a pd.DataFrame with each of the observations (positive and negative) of prioritization found in the event log. If spilling
+    to disk, the identical prioritizations are aggregated, and their two observations have their number of occurrences in the column
+    [weight].
     """
     # Dictionaries with the attribute name and delayed/prioritized renamed values
     delayed_attributes = {attribute: _add_prefix(DELAYED_PREFIX, attribute) for attribute in attributes}
     prioritized_attributes = {attribute: _add_prefix(PRIORITIZED_PREFIX, attribute) for attribute in attributes}
+    # Build the SQL query retrieving the prioritized and delayed events
+    query = _prioritizations_query(delayed_attributes, prioritized_attributes, log_ids)
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend '{}', expected one of {}.".format(backend, sorted(BACKENDS)))
+    if spill_dir is not None:
+        # Aggregate the prioritizations on disk, and split the distinct ones into observations
+        return _discover_spilled_prioritized_instances(
+            event_log,
+            attributes,
+            query,
+            delayed_attributes,
+            prioritized_attributes,
+            outcome,
+            log_ids,
+            spill_dir,
+            batch_size,
+            weight,
+            backend,
+        )
+    # Query the prioritized and delayed events
+    if backend == "duckdb":
+        [prioritizations] = list(_duckdb_prioritizations(event_log, attributes, query, log_ids))
+    else:
+        prioritizations = ps.sqldf(query, locals())
+    # Split the log so each activity instance is an observation
+    prioritized_instances = _split_to_individual_observations(
+        prioritizations, list(delayed_attributes.values()), list(prioritized_attributes.values()), outcome
+    )
+    # Return extended observations
+    return prioritized_instances
+
+
+def _prioritizations_query(delayed_attributes: dict, prioritized_attributes: dict, log_ids: EventLogIDs) -> str:
+    """
+    Build the SQL query to retrieve, from the table 'event_log', the attributes of each pair of activity instances where one (delayed)
+    was enabled before the other (prioritized), but started after it, in the same resource.
+
+    :param delayed_attributes:      dict with the attribute names and their renamed values for the delayed instances.
+    :param prioritized_attributes:  dict with the attribute names and their renamed values for the prioritized instances.
+    :param log_ids:                 mapping for the column IDs of the event log.
+
+    :return: the SQL query.
+    """
     # Define columns for the SQL query
     columns = [
-        "delayed.{} as {}".format(attribute, delayed_attributes[attribute]) for attribute in delayed_attributes
+        'delayed."{}" as "{}"'.format(attribute, delayed_attributes[attribute]) for attribute in delayed_attributes
     ] + [
-        "prioritized.{} as {}".format(attribute, prioritized_attributes[attribute])
+        'prioritized."{}" as "{}"'.format(attribute, prioritized_attributes[attribute])
         for attribute in prioritized_attributes
     ]
-    # Query the prioritized and delayed events
-    prioritizations = ps.sqldf(
-        """
-        SELECT {}
+    # Return query
+    return """
+        SELECT {columns}
         FROM event_log as delayed, event_log as prioritized
-        WHERE (delayed.enabled_time < prioritized.enabled_time and 
-                delayed.start_time > prioritized.start_time and 
-                delayed.Resource = prioritized.Resource)
+        WHERE (delayed."{enabled_time}" < prioritized."{enabled_time}" and 
+                delayed."{start_time}" > prioritized."{start_time}" and 
+                delayed."{resource}" = prioritized."{resource}")
     """.format(
-            ", ".join(columns)
-        ),
-        locals(),
+        columns=", ".join(columns),
+        enabled_time=log_ids.enabled_time,
+        start_time=log_ids.start_time,
+        resource=log_ids.resource,
     )
-    # Split the log so each activity instance is an observation
+
+
+def _prune_event_log(event_log: pd.DataFrame, log_ids: EventLogIDs = DEFAULT_CSV_IDS) -> pd.DataFrame:
+    """
+    Remove the activity instances that cannot be part of any prioritization, i.e., the ones whose waiting interval (from their
+    enabled to their start time) neither contains nor is contained in the interval of another activity instance of the same
+    resource. An activity instance is prioritized over another if it was enabled after it but started before, and delayed if it
+    was enabled before another one that started before it.
+
+    For this, the activity instances are indexed per resource and sorted by enabled time, computing, for each enabled time, the
+    latest start of the instances enabled before (if later than its own start, it has been prioritized), and the earliest start
+    of the instances enabled after (if earlier than its own start, it has been delayed).
+
+    :param event_log:   event log to prune.
+    :param log_ids:     mapping for the column IDs of the event log.
+
+    :return: a pd.DataFrame with the activity instances of [event_log] that are part of, at least, one prioritization.
+    """
+    resource, enabled, start = "resource", "enabled", "start"
+    # Index the waiting intervals, discarding the ones that cannot be compared (missing values)
+    intervals = pd.DataFrame(
+        {
+            resource: event_log[log_ids.resource].to_numpy(),
+            enabled: _to_epoch_nanoseconds(event_log[log_ids.enabled_time]).to_numpy(),
+            start: _to_epoch_nanoseconds(event_log[log_ids.start_time]).to_numpy(),
+        }
+    ).dropna()
+    intervals = intervals.astype({enabled: "int64", start: "int64"})
+    # Earliest and latest start of the instances enabled at the same time in the same resource (sorted by enabled time)
+    bounds = intervals.groupby([resource, enabled], observed=True, sort=True)[start].agg(["min", "max"])
+    by_resource = bounds.groupby(level=0, observed=True)
+    # Latest start of the instances enabled strictly before, and earliest start of the ones enabled strictly after
+    bounds["latest_start_before"] = by_resource["max"].cummax().groupby(level=0, observed=True).shift(1)
+    bounds["earliest_start_after"] = (
+        bounds["min"].iloc[::-1].groupby(level=0, observed=True).cummin().iloc[::-1].groupby(level=0, observed=True).shift(-1)
+    )
+    bounds = bounds.drop(columns=["min", "max"])
+    # Keep the instances started before the latest start of the previous ones, or after the earliest start of the next ones
+    intervals = intervals.join(bounds, on=[resource, enabled])
+    involved = (intervals["latest_start_before"] > intervals[start]) | (intervals["earliest_start_after"] < intervals[start])
+    keep = np.zeros(len(event_log), dtype=bool)
+    keep[intervals.index[involved.to_numpy()]] = True
+    return event_log[keep]
+
+
+def _discover_spilled_prioritized_instances(
+    event_log: pd.DataFrame,
+    attributes: list[str],
+    query: str,
+    delayed_attributes: dict,
+    prioritized_attributes: dict,
+    outcome: str,
+    log_ids: EventLogIDs,
+    spill_dir: Union[str, Path],
+    batch_size: int,
+    weight: str,
+    backend: str = "pandasql",
+) -> pd.DataFrame:
+    """
+    Run the prioritizations query (over an on-disk SQLite copy of the event log, or DuckDB spilling to the temporary directory)
+    aggregating the identical prioritizations inside the database engine, so the (non-aggregated) pairs are never in memory. The
+    distinct prioritizations are fetched [batch_size] rows at a time, but then loaded all together and split into individual
+    observations (both with the number of occurrences of the prioritization as weight). Thus, all the distinct prioritizations
+    (twice, as observations, and then one-hot encoded) must fit in memory.
+
+    :return: a pd.DataFrame with the observations of each distinct prioritization, and its number of occurrences in the column
+    [weight].
+    """
+    columns = list(delayed_attributes.values()) + list(prioritized_attributes.values())
+    query = aggregated_prioritizations_query(query, columns, weight)
+    with tempfile.TemporaryDirectory(prefix="prioritization_discovery_", dir=spill_dir) as tmp_dir:
+        # Query the distinct prioritizations (and their weight), and load them all in memory
+        if backend == "duckdb":
+            batches = _duckdb_prioritizations(event_log, attributes, query, log_ids, batch_size, tmp_dir)
+        else:
+            batches = _sqlite_prioritizations(event_log, attributes, query, log_ids, batch_size, tmp_dir)
+        aggregated = concat_batches(batches, columns + [weight])
+    # Split them so each activity instance is an observation (keeping the weight of the prioritization)
     prioritized_instances = _split_to_individual_observations(
-        prioritizations, list(delayed_attributes.values()), list(prioritized_attributes.values()), outcome
+        aggregated, list(delayed_attributes.values()), list(prioritized_attributes.values()), outcome
     )
-    # Return extended observations
+    prioritized_instances[weight] = np.concatenate([aggregated[weight].to_numpy(dtype="int64")] * 2)
     return prioritized_instances
 
 
+def _sqlite_prioritizations(
+    event_log: pd.DataFrame,
+    attributes: list[str],
+    query: str,
+    log_ids: EventLogIDs,
+    batch_size: int,
+    tmp_dir: Union[str, Path],
+) -> Iterator[pd.DataFrame]:
+    """
+    Run the prioritizations query over an on-disk SQLite copy of the event log (stored in [tmp_dir]), yielding the resulting
+    rows in batches of [batch_size].
+    """
+    connection = sqlite3.connect(os.path.join(tmp_dir, "event_log.db"))
+    try:
+        # Store the temporary results of the query (e.g., the sorter of the aggregation) in files in [tmp_dir]
+        connection.execute("PRAGMA temp_store = FILE")
+        connection.execute("PRAGMA temp_store_directory = '{}'".format(str(tmp_dir).replace("'", "''")))
+        # Store the needed columns, with the timestamps as integers (nanoseconds since epoch) to compare them
+        sql_event_log = event_log[_needed_columns(attributes, log_ids)].copy()
+        for column in [log_ids.enabled_time, log_ids.start_time]:
+            sql_event_log[column] = _to_epoch_nanoseconds(sql_event_log[column])
+        sql_event_log.to_sql("event_log", connection, index=False)
+        del sql_event_log
+        # Query the prioritizations and retrieve them in batches
+        cursor = connection.execute(query)
+        column_names = [description[0] for description in cursor.description]
+        for rows in iter(lambda: cursor.fetchmany(batch_size), []):
+            yield pd.DataFrame(rows, columns=column_names)
+    finally:
+        connection.close()
+
+
+def _duckdb_prioritizations(
+    event_log: pd.DataFrame,
+    attributes: list[str],
+    query: str,
+    log_ids: EventLogIDs,
+    batch_size: Optional[int] = None,
+    tmp_dir: Optional[Union[str, Path]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Run the prioritizations query with an embedded DuckDB database, which evaluates the join (hash-partitioned by resource, with
+    the time predicates as range conditions) in parallel and spilling to disk if it does not fit in memory. The result is
+    retrieved as Arrow record batches.
+
+    :param batch_size:  number of rows to yield in each batch, or None to yield all of them in a single pd.DataFrame.
+    :param tmp_dir:     directory where DuckDB spills its intermediate results (if None, a temporary directory removed afterwards,
+                        instead of DuckDB's default './.tmp' in the current working directory).
+    """
+    try:
+        import duckdb
+    except ImportError as error:
+        raise ImportError(
+            "The 'duckdb' backend requires 'duckdb', install it with 'pip install prioritization-discovery[duckdb]'."
+        ) from error
+    if tmp_dir is None:
+        with tempfile.TemporaryDirectory(prefix="prioritization_discovery_") as tmp_dir:
+            yield from _duckdb_prioritizations(event_log, attributes, query, log_ids, batch_size, tmp_dir)
+        return
+    connection = duckdb.connect(config={"temp_directory": str(tmp_dir)})
+    try:
+        connection.register("event_log", event_log[_needed_columns(attributes, log_ids)])
+        result = connection.execute(query)
+        if batch_size is None:
+            yield result.to_arrow_table().to_pandas()
+        else:
+            for batch in result.to_arrow_reader(batch_size):
+                yield batch.to_pandas()
+    finally:
+        connection.close()
+
+
+def _to_epoch_nanoseconds(timestamps: pd.Series) -> pd.Series:
+    timestamps = pd.to_datetime(timestamps, utc=True)
+    return pd.Series(timestamps.array.asi8, index=timestamps.index, dtype="Int64").mask(timestamps.isna())
+
+
 def _split_to_individual_observations(
     event_log: pd.DataFrame, delayed_attributes: list[str], prioritized_attributes: list[str], outcome: str
 ) -> pd.DataFrame:
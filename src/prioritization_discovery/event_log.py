@@ -0,0 +1,111 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, Union
+
+import pandas as pd
+
+from .config import DEFAULT_CSV_IDS, EventLogIDs
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+PARQUET_EXTENSIONS = {".parquet", ".pq"}
+
+
+def read_event_log(
+    source: Union[str, Path, "pa.Table"], attributes: list[str], log_ids: EventLogIDs = DEFAULT_CSV_IDS
+) -> pd.DataFrame:
+    """
+    Read, from a CSV file, a Parquet file, or a pyarrow.Table, the columns of the event log needed to discover the prioritization
+    rules (the resource, enabled and start times, and the given attributes). The timestamps are parsed (to UTC) while reading,
+    avoiding to load the unused columns and to process the dates in a second pass. The resource column is stored as a categorical
+    and, when reading from Parquet or Arrow, so are all the string columns (dictionary-encoded by Arrow).
+
+    :param source:      path to the event log (CSV or Parquet, based on its extension), or pyarrow.Table with the event log.
+    :param attributes:  list of column names for the attributes to use as features for the prioritization.
+    :param log_ids:     mapping for the column IDs of the event log.
+
+    :return: a pd.DataFrame with the needed columns of the event log.
+    """
+    time_columns = [log_ids.enabled_time, log_ids.start_time]
+    columns = _needed_columns(attributes, log_ids)
+    if isinstance(source, (str, Path)) and Path(source).suffix.lower() not in PARQUET_EXTENSIONS:
+        # Read only the needed columns from the CSV file, parsing the dates at read time
+        event_log = pd.read_csv(
+            source,
+            usecols=columns,
+            parse_dates=time_columns,
+            date_format="ISO8601",
+            dtype={log_ids.resource: "category"},
+        )
+    else:
+        # Read only the needed columns from the Parquet file or Arrow table
+        event_log = _read_arrow_event_log(source, columns, time_columns)
+    # Ensure the timestamps are UTC-aware (no-op if already parsed like that)
+    for column in time_columns:
+        if not isinstance(event_log[column].dtype, pd.DatetimeTZDtype) or str(event_log[column].dt.tz) != "UTC":
+            event_log[column] = pd.to_datetime(event_log[column], utc=True, format="ISO8601")
+    # Return event log
+    return event_log
+
+
+def _read_arrow_event_log(
+    source: Union[str, Path, "pa.Table"], columns: list[str], time_columns: list[str]
+) -> pd.DataFrame:
+    """
+    Read the given columns of a Parquet file (memory-mapped) or a pyarrow.Table, converting the timestamps to UTC and the
+    string columns to categoricals in Arrow, before creating the pd.DataFrame.
+    """
+    pa = import_pyarrow("Reading Parquet files or Arrow tables")
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    # Select or read (memory-mapped) the needed columns
+    if isinstance(source, pa.Table):
+        table = source.select(columns)
+    else:
+        # Dictionary-encode the string columns directly when decoding the Parquet pages
+        schema = pq.read_schema(source)
+        string_columns = [
+            column
+            for column in columns
+            if column not in time_columns and pa.types.is_string(schema.field(column).type)
+        ]
+        table = pq.read_table(source, columns=columns, memory_map=True, read_dictionary=string_columns)
+    # Convert timestamps and string columns to their compact representation
+    for column in columns:
+        index = table.schema.get_field_index(column)
+        field_type = table.schema.field(index).type
+        if column in time_columns:
+            try:
+                table = table.set_column(index, column, pc.cast(table[column], pa.timestamp("ns", tz="UTC")))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                pass  # Non-standard format, parsed with pandas afterwards
+        elif pa.types.is_string(field_type) or pa.types.is_large_string(field_type):
+            table = table.set_column(index, column, pc.dictionary_encode(table[column]))
+    # Return as pd.DataFrame
+    return table.to_pandas()
+
+
+def import_pyarrow(feature: str):
+    """
+    Import the (optional) pyarrow dependency, raising an informative error if it is not installed.
+
+    :param feature: description of the feature requiring pyarrow, to include in the error message.
+
+    :return: the pyarrow module.
+    """
+    try:
+        import pyarrow
+    except ImportError as error:
+        raise ImportError(
+            "{} requires 'pyarrow', install it with 'pip install prioritization-discovery[parquet]'.".format(feature)
+        ) from error
+    return pyarrow
+
+
+def _needed_columns(attributes: list[str], log_ids: EventLogIDs) -> list[str]:
+    """
+    Get the list of columns (without duplicates, and keeping the order) needed to discover the prioritization rules.
+    """
+    columns = [log_ids.resource, log_ids.enabled_time, log_ids.start_time] + attributes
+    return list(dict.fromkeys(columns))
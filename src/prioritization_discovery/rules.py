@@ -1,11 +1,37 @@
 import copy
+import itertools
 import re
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Iterator, Optional
 
+import numpy as np
 import pandas as pd
 from sklearn.tree import DecisionTreeClassifier, _tree
 
+from .shared import ObservationArrays, SharedObservations, SharedObservationsHandle, call_with_shared_observations
 
-def discover_prioritization_rules(data: pd.DataFrame, outcome: str) -> list:
+
+# Default grid of decision tree hyperparameters to evaluate when tuning them (the leaf size as a fraction of the total weight, so
+# it is the same whether the identical prioritizations are aggregated with their number of occurrences as weight or not)
+DEFAULT_PARAM_GRID = {"max_depth": [None, 3, 5, 10], "min_weight_fraction_leaf": [0.0, 0.01, 0.05]}
+# Number of folds of the cross-validation when tuning the decision tree hyperparameters
+TUNING_FOLDS = 3
+# Maximum loss of (mean) confidence w.r.t. the best setting to prefer a setting with simpler rules, or faster to fit
+TUNING_TOLERANCE = 0.01
+
+
+def discover_prioritization_rules(
+    data: pd.DataFrame,
+    outcome: str,
+    n_jobs: int = 1,
+    max_levels: Optional[int] = None,
+    weight: Optional[str] = None,
+    tune: bool = False,
+    param_grid: Optional[dict] = None,
+    quality: bool = False,
+    stats: Optional[dict] = None,
+) -> list:
     """
     Discover, incrementally, rules to set the priority level of an activity instance in such a way that; when two activity instances are
     waiting to be executed (enabled), the one with the highest priority goes first. To do this, first discover the cases in the event log
@@ -15,71 +41,185 @@ def discover_prioritization_rules(data: pd.DataFrame, outcome: str) -> list:
     :param data:    pd.DataFrame with the observations of delayed and prioritized activity instances. The two activity instances
                     of the same prioritization (e.g. a specific instance of A prioritized over a specific instance of B) share
                     the same index in the DataFrame.
-    :param outcome: ID of the column with the variable to predict (1 positive, 0 negative).
+    :param outcome:     ID of the column with the variable to predict (1 positive, 0 negative).
+    :param n_jobs:      number of worker processes to fit the decision trees of each level (1 to run sequentially).
+    :param max_levels:  maximum number of priority levels to discover (None for no limit).
+    :param weight:      if not None, ID of the column with the weight of each observation (e.g., number of occurrences when
+                        the identical prioritizations have been aggregated).
+    :param tune:        if True, choose the 'max_depth' and 'min_weight_fraction_leaf' of the decision trees with a cross-validation
+                        over the observations, before discovering the rules.
+    :param param_grid:  dict with the values to evaluate for each decision tree hyperparameter when tuning (DEFAULT_PARAM_GRID if
+                        None). Hyperparameters counting observations (e.g., 'min_samples_leaf') ignore [weight], so they lead to
+                        different trees when the identical prioritizations are aggregated.
+    :param quality:     if True, add to each level a dict ('quality') with the support, confidence, and lift of its rules, and
+                        the number of prioritized and delayed observations they cover (among the ones not covered by the
+                        previous levels).
+    :param stats:       if not None, dict to fill with statistics of the execution (chosen hyperparameters and tuning runtime).
 
     :return: a list of dicts with the priority level and the corresponding rules.
     """
-    # Create empty list for the incremental models
-    models = []
-    # Get the data we'll be using in each iteration
-    filtered_data = pd.get_dummies(data)
-    dummy_columns = {
-        column: list(data[column].unique()) for column in data.columns if column not in filtered_data.columns
-    }
-    # Extract rules level by level
-    continue_search = True
-    while continue_search:
-        # Discover a new model for the current observations
-        model = _get_rules(filtered_data, outcome)
-        # If any rule has been discovered
-        if len(model) > 0:
-            # Reverse the one hot encoding and save model for this priority level
-            parsed_model = _reverse_one_hot_encoding(model, dummy_columns, filtered_data)
-            models += [parsed_model]
-            # Remove all observations covered by these rules (also negative ones)
-            predictions = _predict(model, filtered_data.drop([outcome], axis=1))
-            true_positive_indexes = filtered_data[(filtered_data[outcome] == 1) & predictions].index
-            filtered_data = filtered_data.loc[filtered_data.index.difference(true_positive_indexes)]
-            # If no more prioritizations pending end search
-            if len(filtered_data[filtered_data[outcome] == 1]) == 0:
-                continue_search = False
-        else:
-            # If no rules have been discovered, end search
-            continue_search = False
+    # Create the pool of workers (if parallel) for all the levels
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            models = list(_iterate_models(data, outcome, max_levels, weight, tune, param_grid, stats, executor))
+    else:
+        models = list(_iterate_models(data, outcome, max_levels, weight, tune, param_grid, stats))
     # Create empty list for priority levels
     priority_levels = []
     current_lvl = 1
-    for model in models:
-        parsed_model = model
-        priority_levels += [{"priority_level": current_lvl, "rules": parsed_model}]
+    for model, model_quality in models:
+        priority_levels += [_to_priority_level(current_lvl, model, model_quality if quality else None)]
         current_lvl += 1
     # Return list of level rules
     return priority_levels
 
 
-def _get_rules(data: pd.DataFrame, outcome: str) -> list:
+def _to_priority_level(priority_level: int, model: list, model_quality: Optional[dict] = None) -> dict:
+    """
+    Build the dict with the priority level, its rules, and (if not None) their quality.
+    """
+    level = {"priority_level": priority_level, "rules": model}
+    if model_quality is not None:
+        level["quality"] = model_quality
+    return level
+
+
+def _iterate_models(
+    data: pd.DataFrame,
+    outcome: str,
+    max_levels: Optional[int] = None,
+    weight: Optional[str] = None,
+    tune: bool = False,
+    param_grid: Optional[dict] = None,
+    stats: Optional[dict] = None,
+    executor: Optional[Executor] = None,
+) -> Iterator[tuple[list, dict]]:
+    """
+    Discover, level by level, the rules of each priority level, removing in each iteration the prioritized observations
+    covered by the rules of the previous levels. The levels are discovered lazily, i.e., each one when it is requested.
+
+    :param data:        pd.DataFrame with the observations of delayed and prioritized activity instances.
+    :param outcome:     ID of the column with the variable to predict (1 positive, 0 negative).
+    :param max_levels:  maximum number of priority levels to discover (None for no limit).
+    :param weight:      if not None, ID of the column with the weight of each observation.
+    :param tune:        if True, tune the decision tree hyperparameters before discovering the rules.
+    :param param_grid:  dict with the values to evaluate for each decision tree hyperparameter when tuning.
+    :param stats:       if not None, dict to fill with statistics of the execution.
+    :param executor:    if not None, executor to fit the decision trees of each level in parallel. The encoded observations are
+                        placed in shared memory once, and the workers attach to them instead of receiving a copy in each task.
+
+    :return: an iterator over the (parsed) rules of each priority level, together with their quality measures.
+    """
+    num_levels = 0
+    # Get the data we'll be using in each iteration
+    filtered_data = pd.get_dummies(data)
+    dummy_columns = {
+        column: list(data[column].unique()) for column in data.columns if column not in filtered_data.columns
+    }
+    features = [column for column in filtered_data.columns if column not in (outcome, weight)]
+    # Tune only if there are enough distinct prioritizations to have (at least) two folds
+    num_folds = min(TUNING_FOLDS, filtered_data.index.nunique())
+    folds = _cross_validation_folds(filtered_data.index, num_folds) if tune and num_folds > 1 else None
+    # Place the encoded observations in shared memory for the workers (if parallel)
+    shared = SharedObservations(filtered_data, features, outcome, weight, folds) if executor is not None else None
+    encoded_index = filtered_data.index
+    try:
+        # Search only if there are prioritized and delayed observations to learn from (and levels to discover)
+        continue_search = (max_levels is None or max_levels > 0) and filtered_data[outcome].nunique() == 2
+        # Choose the decision tree hyperparameters (if tuning)
+        tree_params = {}
+        if tune:
+            start = time.perf_counter()
+            if folds is not None and continue_search:
+                tree_params = _tune_tree_params(
+                    filtered_data,
+                    outcome,
+                    weight,
+                    param_grid if param_grid is not None else DEFAULT_PARAM_GRID,
+                    folds,
+                    executor,
+                    shared.handle if shared is not None else None,
+                )
+            if stats is not None:
+                stats["tree_params"] = tree_params
+                stats["tuning_runtime"] = time.perf_counter() - start
+        # Extract rules level by level
+        while continue_search:
+            # Discover a new model for the current observations
+            if shared is not None:
+                shared.set_active(encoded_index.isin(filtered_data.index))
+            model = _get_rules(
+                filtered_data, outcome, weight, executor, shared.handle if shared is not None else None, tree_params
+            )
+            # If any rule has been discovered
+            if len(model) > 0:
+                # Reverse the one hot encoding and save model for this priority level
+                parsed_model = _reverse_one_hot_encoding(model, dummy_columns, filtered_data)
+                num_levels += 1
+                # Remove all observations covered by these rules (also negative ones)
+                predictions = _predict(model, filtered_data.drop([outcome], axis=1))
+                model_quality = _measure_quality(predictions, filtered_data, outcome, weight)
+                true_positive_indexes = filtered_data[(filtered_data[outcome] == 1) & predictions].index
+                filtered_data = filtered_data.loc[filtered_data.index.difference(true_positive_indexes)]
+                # If no more prioritizations pending (or no delayed observations left to compare with) end search
+                if filtered_data[outcome].nunique() < 2:
+                    continue_search = False
+                # If the maximum number of levels has been reached, end search
+                if max_levels is not None and num_levels >= max_levels:
+                    continue_search = False
+                # Return the model of this priority level
+                yield parsed_model, model_quality
+            else:
+                # If no rules have been discovered, end search
+                continue_search = False
+    finally:
+        if shared is not None:
+            shared.close()
+
+
+def _get_rules(
+    data: pd.DataFrame,
+    outcome: str,
+    weight: Optional[str] = None,
+    executor: Optional[Executor] = None,
+    shared: Optional[SharedObservationsHandle] = None,
+    tree_params: Optional[dict] = None,
+) -> list:
     """
     Discover one rule that lead to the positive outcome in the observations passed as argument in [data]. To do this, it uses a decision
     tree classifier to discover a rule 5 times, and gets the one with the highest confidence.
 
-    :param data:    pd.DataFrame with one observation per row.
-    :param outcome: ID of the column with the variable to predict (1 positive, 0 negative).
+    :param data:        pd.DataFrame with one observation per row.
+    :param outcome:     ID of the column with the variable to predict (1 positive, 0 negative).
+    :param weight:      if not None, ID of the column with the weight of each observation.
+    :param executor:    if not None, executor to fit the 5 decision trees in parallel.
+    :param shared:      handle of the observations in shared memory (same as [data]), required if [executor] is not None.
+    :param tree_params: hyperparameters of the decision trees (default ones if None).
     :return: the discovered rules with the highest confidence.
     """
-    # Discover 5 times and get the one with more confidence
+    features = [column for column in data.columns if column not in (outcome, weight)]
+    weights = data[weight] if weight is not None else None
+    # Discover 5 times (in parallel if an executor is given)
+    if executor is not None:
+        futures = [
+            executor.submit(call_with_shared_observations, shared, _fit_shared_tree_rules, features, tree_params)
+            for _ in range(5)
+        ]
+        candidates = [future.result() for future in futures]
+    else:
+        candidates = [_fit_tree_rules(data[features], data[outcome], weights, None, tree_params) for _ in range(5)]
+    # Get the one with more confidence
+    positives = data[outcome].to_numpy() == 1
+    sample_weights = weights.to_numpy() if weights is not None else np.ones(len(data))
     best_confidence = 0
     best_rules = []
-    for i in range(5):
-        # Train new model to extract 1 rule
-        new_model = DecisionTreeClassifier()
-        new_model.fit(data[[column for column in data.columns if column is not outcome]], data[outcome])
-        best_rules = _tree_to_best_rules(new_model, [column for column in data.columns if column is not outcome])
+    for rules in candidates:
+        best_rules = rules
         # If any rule has been discovered
         if len(best_rules) > 0:
             # Measure confidence
-            predictions = _predict(best_rules, data.drop([outcome], axis=1))
-            true_positives = [p and a for (p, a) in zip(predictions, data[outcome])]
-            confidence = sum(true_positives) / sum(predictions)
+            predictions = _predict(best_rules, data[features])
+            confidence = _confidence(predictions, positives, sample_weights)
             # Retain if it's better than the previous one
             if confidence > best_confidence:
                 best_confidence = confidence
@@ -88,6 +228,168 @@ def _get_rules(data: pd.DataFrame, outcome: str) -> list:
     return best_rules
 
 
+def _fit_tree_rules(
+    features: pd.DataFrame,
+    labels: pd.Series,
+    weights: Optional[pd.Series] = None,
+    feature_names: Optional[list] = None,
+    tree_params: Optional[dict] = None,
+) -> list:
+    """
+    Train a decision tree classifier over the observations and extract the rule leading to its best (positive) leaf.
+
+    :param features:        pd.DataFrame (or np.ndarray) with the (encoded) attributes of each observation.
+    :param labels:          pd.Series (or np.ndarray) with the outcome of each observation (1 positive, 0 negative).
+    :param weights:         if not None, pd.Series (or np.ndarray) with the weight of each observation.
+    :param feature_names:   name of each feature, if [features] is not a pd.DataFrame.
+    :param tree_params:     hyperparameters of the decision tree (default ones if None).
+    :return: the rules of the best leaf of the tree (wrapped in a list).
+    """
+    # Train new model to extract 1 rule
+    new_model = DecisionTreeClassifier(**(tree_params or {}))
+    new_model.fit(features, labels, sample_weight=weights)
+    return _tree_to_best_rules(new_model, feature_names if feature_names is not None else list(features.columns))
+
+
+def _fit_shared_tree_rules(
+    observations: ObservationArrays, feature_names: list, tree_params: Optional[dict] = None
+) -> list:
+    """
+    Worker version of _fit_tree_rules() over the observations in shared memory (see call_with_shared_observations()), already
+    compacted to the ones considered in the current level.
+    """
+    return _fit_tree_rules(observations.features, observations.labels, observations.weights, feature_names, tree_params)
+
+
+def _tune_tree_params(
+    data: pd.DataFrame,
+    outcome: str,
+    weight: Optional[str],
+    param_grid: dict,
+    folds: np.ndarray,
+    executor: Optional[Executor] = None,
+    shared: Optional[SharedObservationsHandle] = None,
+) -> dict:
+    """
+    Evaluate, with a cross-validation over the observations, each combination of decision tree hyperparameters in [param_grid], and
+    choose the one leading to the rules with the highest (mean) confidence in the test folds. Among the combinations within
+    TUNING_TOLERANCE of the highest confidence, the one with fewer conditions in its rules is chosen, and then the faster to fit.
+
+    :param data:        pd.DataFrame with the (encoded) observations.
+    :param outcome:     ID of the column with the variable to predict (1 positive, 0 negative).
+    :param weight:      if not None, ID of the column with the weight of each observation.
+    :param param_grid:  dict with the values to evaluate for each decision tree hyperparameter.
+    :param folds:       cross-validation fold of each observation.
+    :param executor:    if not None, executor to evaluate the combinations (and folds) in parallel.
+    :param shared:      handle of the observations in shared memory (same as [data]), required if [executor] is not None.
+
+    :return: a dict with the chosen hyperparameters.
+    """
+    features = [column for column in data.columns if column not in (outcome, weight)]
+    combinations = [dict(zip(param_grid, values)) for values in itertools.product(*param_grid.values())]
+    tasks = [(tree_params, fold) for tree_params in combinations for fold in np.unique(folds)]
+    # Evaluate each combination in each fold
+    if executor is not None:
+        futures = [
+            executor.submit(call_with_shared_observations, shared, _evaluate_tree_params, features, tree_params, fold)
+            for tree_params, fold in tasks
+        ]
+        results = [future.result() for future in futures]
+    else:
+        observations = ObservationArrays(
+            features=data[features].to_numpy(dtype=np.float32),
+            labels=data[outcome].to_numpy(dtype=np.int8),
+            weights=data[weight].to_numpy(dtype=np.float64) if weight is not None else None,
+            folds=folds,
+        )
+        results = [_evaluate_tree_params(observations, features, tree_params, fold) for tree_params, fold in tasks]
+    # Average the results of each combination
+    evaluations = pd.DataFrame(
+        [[index // len(np.unique(folds))] + list(result) for index, result in enumerate(results)],
+        columns=["combination", "confidence", "num_conditions", "runtime"],
+    ).groupby("combination").mean()
+    # Keep the combinations close to the best confidence, and choose the simplest and fastest
+    candidates = evaluations[evaluations["confidence"] >= evaluations["confidence"].max() - TUNING_TOLERANCE]
+    best = candidates.sort_values(["num_conditions", "runtime"]).index[0]
+    return combinations[best]
+
+
+def _evaluate_tree_params(
+    observations: ObservationArrays, feature_names: list, tree_params: dict, fold: int
+) -> tuple[float, int, float]:
+    """
+    Discover the rules with the given decision tree hyperparameters training with all the folds but [fold], and measure them
+    in the observations of [fold].
+
+    :return: a tuple with the confidence of the rules in the test fold, their number of conditions, and the training runtime.
+    """
+    train, test = observations.folds != fold, observations.folds == fold
+    weights = observations.weights
+    # Train with all the folds but one
+    start = time.perf_counter()
+    rules = _fit_tree_rules(
+        observations.features[train],
+        observations.labels[train],
+        weights[train] if weights is not None else None,
+        feature_names,
+        tree_params,
+    )
+    runtime = time.perf_counter() - start
+    # Measure the confidence in the remaining fold
+    predictions = _predict_array(rules, observations.features[test], feature_names)
+    confidence = _confidence(
+        predictions,
+        observations.labels[test] == 1,
+        weights[test] if weights is not None else np.ones(test.sum()),
+    )
+    return confidence, sum(len(ruleset) for ruleset in rules), runtime
+
+
+def _cross_validation_folds(index: pd.Index, num_folds: int) -> np.ndarray:
+    """
+    Randomly assign each observation to one of [num_folds] folds, keeping the two observations of the same prioritization (that
+    share the index) in the same fold. When the identical prioritizations are aggregated, all their occurrences fall in the same
+    fold, so the folds (and thus the tuning) may differ from the ones of the non-aggregated observations.
+    """
+    groups, uniques = pd.factorize(index)
+    return (np.random.default_rng(0).permutation(len(uniques)) % num_folds)[groups].astype(np.int8)
+
+
+def _measure_quality(predictions: np.ndarray, data: pd.DataFrame, outcome: str, weight: Optional[str] = None) -> dict:
+    """
+    Measure the quality of the rules of a priority level w.r.t. the observations in [data].
+
+    :param predictions: mask with the observations covered by the rules.
+    :param data:        pd.DataFrame with the observations.
+    :param outcome:     ID of the column with the variable to predict (1 positive, 0 negative).
+    :param weight:      if not None, ID of the column with the weight of each observation.
+
+    :return: a dict with the support (ratio of observations that are prioritized and covered), confidence (ratio of covered
+    observations that are prioritized), lift (confidence divided by the ratio of prioritized observations), and the number of
+    prioritized and delayed observations covered.
+    """
+    positives = data[outcome].to_numpy() == 1
+    weights = data[weight].to_numpy() if weight is not None else np.ones(len(data))
+    total, total_prioritized = weights.sum(), weights[positives].sum()
+    covered_prioritized, covered_delayed = weights[predictions & positives].sum(), weights[predictions & ~positives].sum()
+    confidence = _confidence(predictions, positives, weights)
+    return {
+        "support": float(covered_prioritized / total) if total > 0 else 0.0,
+        "confidence": float(confidence),
+        "lift": float(confidence / (total_prioritized / total)) if total_prioritized > 0 else 0.0,
+        "covered_prioritized": int(covered_prioritized),
+        "covered_delayed": int(covered_delayed),
+    }
+
+
+def _confidence(predictions: np.ndarray, positives: np.ndarray, weights: np.ndarray) -> float:
+    """
+    Compute the (weighted) ratio of positive observations among the ones covered by the rules, or 0 if none is covered.
+    """
+    covered = weights[predictions].sum()
+    return weights[predictions & positives].sum() / covered if covered > 0 else 0
+
+
 def _tree_to_best_rules(tree, feature_names) -> list:
     # Extract tree structure
     tree_ = tree.tree_
@@ -155,30 +457,44 @@ def _summarize_rules(rules: list) -> list:
     return filtered_rules
 
 
-def _predict(rules: list, data: pd.DataFrame) -> list:
-    predictions = []
-    # Predict each observation
-    for index, observation in data.iterrows():
-        prediction = False
-        for ruleset in rules:
-            if _fulfill_ruleset(ruleset, observation):
-                prediction = True
-        predictions += [prediction]
+def _predict(rules: list, data: pd.DataFrame) -> np.ndarray:
+    """
+    Compute (vectorized) which observations in [data] fulfill any of the rulesets in [rules].
+    """
+    return _predict_columns(
+        rules, lambda attribute: data[attribute].to_numpy(dtype=np.float64, na_value=np.nan), len(data)
+    )
+
+
+def _predict_array(rules: list, features: np.ndarray, feature_names: list) -> np.ndarray:
+    """
+    Compute (vectorized) which observations in the matrix [features] (with columns [feature_names]) fulfill any of the rulesets
+    in [rules].
+    """
+    positions = {name: position for position, name in enumerate(feature_names)}
+    return _predict_columns(rules, lambda attribute: features[:, positions[attribute]], len(features))
+
+
+def _predict_columns(rules: list, get_column: Callable, num_observations: int) -> np.ndarray:
+    predictions = np.zeros(num_observations, dtype=bool)
+    # Predict all observations at once, ruleset by ruleset
+    for ruleset in rules:
+        predictions |= _fulfill_ruleset(ruleset, get_column, num_observations)
     # Return predictions
     return predictions
 
 
-def _fulfill_ruleset(rules: list, observation: pd.Series):
-    fulfills = True
+def _fulfill_ruleset(rules: list, get_column: Callable, num_observations: int) -> np.ndarray:
+    fulfills = np.ones(num_observations, dtype=bool)
     for rule in rules:
         values = [float(value) for value in re.findall(r"[\d.]+", rule["value"])]
-        if (
-                (rule['comparison'] == "<=" and observation[rule['attribute']] > values[0]) or
-                (rule['comparison'] == ">" and observation[rule['attribute']] <= values[0]) or
-                (rule['comparison'] == "in" and observation[rule['attribute']] <= values[0]) or
-                (rule['comparison'] == "in" and observation[rule['attribute']] > values[1])
-        ):
-            fulfills = False
+        column = get_column(rule["attribute"])
+        if rule['comparison'] == "<=":
+            fulfills &= ~(column > values[0])
+        elif rule['comparison'] == ">":
+            fulfills &= ~(column <= values[0])
+        elif rule['comparison'] == "in":
+            fulfills &= ~((column <= values[0]) | (column > values[1]))
     return fulfills
 
 
@@ -0,0 +1,155 @@
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class SharedArrayHandle:
+    name: str  # Name of the shared memory block
+    shape: tuple  # Shape of the array stored in the block
+    dtype: str  # Type of the array stored in the block
+
+
+@dataclass(frozen=True)
+class SharedObservationsHandle:
+    features: SharedArrayHandle  # Encoded attributes of the observations (one row per observation)
+    labels: SharedArrayHandle  # Outcome of each observation (1 positive, 0 negative)
+    weights: Optional[SharedArrayHandle]  # Weight of each observation (None if not weighted)
+    folds: Optional[SharedArrayHandle] = None  # Cross-validation fold of each observation (None if not tuning)
+
+
+@dataclass
+class ObservationArrays:
+    features: np.ndarray  # Encoded attributes of the observations (one row per observation)
+    labels: np.ndarray  # Outcome of each observation (1 positive, 0 negative)
+    weights: Optional[np.ndarray]  # Weight of each observation (None if not weighted)
+    folds: Optional[np.ndarray] = None  # Cross-validation fold of each observation (None if not tuning)
+
+
+class SharedObservations:
+    """
+    Encoded observation matrix, labels, and weights placed (once) in shared memory, so worker processes can attach to them by
+    handle instead of receiving a (pickled) copy of the data in each task. In each priority level, the owner compacts (once) the
+    observations still considered into new shared memory blocks, so the workers use them directly without copying them.
+    """
+
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        features: list[str],
+        outcome: str,
+        weight: Optional[str] = None,
+        folds: Optional[np.ndarray] = None,
+    ):
+        self._blocks, self._level_blocks = [], []
+        arrays = [
+            data[features].to_numpy(dtype=np.float32),
+            data[outcome].to_numpy(dtype=np.int8),
+            data[weight].to_numpy(dtype=np.float64) if weight is not None else None,
+            folds,
+        ]
+        handles, self._arrays = [], []
+        for array in arrays:
+            handle, shared_array = self._share(array, self._blocks) if array is not None else (None, None)
+            handles += [handle]
+            self._arrays += [shared_array]
+        self._all_handle = SharedObservationsHandle(*handles)
+        self._handle = self._all_handle
+
+    @property
+    def handle(self) -> SharedObservationsHandle:
+        return self._handle
+
+    def set_active(self, mask: np.ndarray):
+        """
+        Compact the observations still considered in the current priority level into new shared memory blocks (releasing the
+        ones of the previous level), so the handle points to them.
+        """
+        self._release(self._level_blocks)
+        if mask.all():
+            self._handle = self._all_handle
+            return
+        num_active = int(np.count_nonzero(mask))
+        handles = []
+        for array in self._arrays:
+            if array is None:
+                handles += [None]
+            else:
+                handle, compacted = self._allocate((num_active,) + array.shape[1:], array.dtype, self._level_blocks)
+                np.compress(mask, array, axis=0, out=compacted)
+                del compacted
+                handles += [handle]
+        self._handle = SharedObservationsHandle(*handles)
+
+    def close(self):
+        """
+        Release and remove the shared memory blocks (no-op if already closed).
+        """
+        self._arrays = []
+        self._release(self._level_blocks)
+        self._release(self._blocks)
+
+    def __enter__(self) -> "SharedObservations":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _share(self, array: np.ndarray, blocks: list) -> tuple[SharedArrayHandle, np.ndarray]:
+        handle, shared_array = self._allocate(array.shape, array.dtype, blocks)
+        shared_array[...] = array
+        return handle, shared_array
+
+    @staticmethod
+    def _allocate(shape: tuple, dtype: np.dtype, blocks: list) -> tuple[SharedArrayHandle, np.ndarray]:
+        # Create a block of (at least) one byte, as empty blocks are not allowed
+        block = SharedMemory(create=True, size=max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1))
+        blocks += [block]
+        return (
+            SharedArrayHandle(block.name, shape, np.dtype(dtype).str),
+            np.ndarray(shape, dtype=dtype, buffer=block.buf),
+        )
+
+    @staticmethod
+    def _release(blocks: list):
+        for block in blocks:
+            block.close()
+            block.unlink()
+        blocks.clear()
+
+
+def call_with_shared_observations(handle: SharedObservationsHandle, function: Callable, *args) -> Any:
+    """
+    Attach (without copying) to the observations placed in shared memory by SharedObservations, and call [function] with
+    them as function(ObservationArrays, *args). The arrays are only valid during the call, and must not be referenced once it
+    returns (e.g., stored in the returned value).
+
+    :param handle:      handle of the shared observations.
+    :param function:    function to call with the attached arrays.
+
+    :return: the value returned by [function].
+    """
+    array_handles = [handle.features, handle.labels, handle.weights, handle.folds]
+    blocks = [SharedMemory(name=array_handle.name) if array_handle is not None else None for array_handle in array_handles]
+    try:
+        return function(
+            ObservationArrays(
+                *[
+                    np.ndarray(array_handle.shape, dtype=np.dtype(array_handle.dtype), buffer=block.buf)
+                    if array_handle is not None
+                    else None
+                    for array_handle, block in zip(array_handles, blocks)
+                ]
+            ),
+            *args,
+        )
+    finally:
+        for block in blocks:
+            if block is not None:
+                try:
+                    block.close()
+                except BufferError:
+                    pass  # Arrays still referenced (e.g., by the traceback of an exception), released by the process
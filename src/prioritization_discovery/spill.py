@@ -0,0 +1,45 @@
+from typing import Iterable
+
+import pandas as pd
+
+# Default number of rows to fetch at a time from the database engine when spilling to disk
+DEFAULT_BATCH_SIZE = 1_000_000
+
+
+def aggregated_prioritizations_query(query: str, columns: list[str], weight: str) -> str:
+    """
+    Wrap the prioritizations query to aggregate, inside the database engine (which spills to disk the intermediate results that do
+    not fit in memory), the identical prioritizations into a single one with their number of occurrences as weight.
+
+    :param query:   SQL query retrieving the prioritizations (pairs of delayed and prioritized activity instances).
+    :param columns: list with the columns of the prioritizations retrieved by [query].
+    :param weight:  ID of the column to store the number of occurrences of each prioritization.
+
+    :return: the SQL query retrieving one row per distinct prioritization, and its weight.
+    """
+    quoted_columns = ", ".join('"{}"'.format(column) for column in columns)
+    return """
+        SELECT {columns}, COUNT(*) as "{weight}"
+        FROM ({query}) as prioritizations
+        GROUP BY {columns}
+    """.format(
+        columns=quoted_columns,
+        weight=weight,
+        query=query,
+    )
+
+
+def concat_batches(batches: Iterable[pd.DataFrame], columns: list[str]) -> pd.DataFrame:
+    """
+    Concatenate the batches retrieved from the database engine into a single pd.DataFrame.
+
+    :param batches: iterable with the pd.DataFrames to concatenate.
+    :param columns: list with the columns of the batches (to build the pd.DataFrame when there are no batches).
+
+    :return: a pd.DataFrame with the rows of all the batches.
+    """
+    batches = [batch for batch in batches if len(batch) > 0]
+    if len(batches) == 0:
+        # No rows, return empty pd.DataFrame with the corresponding columns
+        return pd.DataFrame(columns=columns)
+    return pd.concat(batches, ignore_index=True)
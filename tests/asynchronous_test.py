@@ -0,0 +1,73 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from prioritization_discovery.asynchronous import discover_priority_rules_async
+from prioritization_discovery.config import DEFAULT_CSV_IDS
+from prioritization_discovery.discovery import discover_priority_rules
+
+
+def _read_event_log_3() -> pd.DataFrame:
+    event_log = pd.read_csv("./tests/assets/event_log_3.csv")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    return event_log
+
+
+def test_discover_priority_rules_async():
+    events = []
+    # Get priority levels and their rules, collecting the progress events
+    prioritization_levels = asyncio.run(
+        discover_priority_rules_async(_read_event_log_3(), ['urgency'], on_progress=events.append)
+    )
+    # Assert expected levels and rules
+    assert prioritization_levels == [
+        {'priority_level': 1, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'high'}]]},
+        {'priority_level': 2, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'medium'}]]}
+    ]
+    # Assert progress events of each stage and level
+    assert [(event['stage'], event.get('priority_level')) for event in events] == [
+        ('prioritized_instances', None),
+        ('priority_level', 1),
+        ('priority_level', 2),
+        ('rules_discovery', None)
+    ]
+    assert events[-1]['num_priority_levels'] == 2
+
+
+def test_discover_priority_rules_async_cancelled():
+    events = []
+
+    async def discover():
+        task = asyncio.current_task()
+
+        async def on_progress(event: dict):
+            events.append(event)
+            # Cancel the discovery once the first level is discovered
+            if event['stage'] == 'priority_level':
+                task.cancel()
+
+        return await discover_priority_rules_async(_read_event_log_3(), ['urgency'], on_progress=on_progress)
+
+    # Assert the discovery is cancelled after the first level
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(discover())
+    assert [(event['stage'], event.get('priority_level')) for event in events] == [
+        ('prioritized_instances', None),
+        ('priority_level', 1)
+    ]
+
+
+def test_discover_priority_rules_async_grouped():
+    events = []
+    # Get priority levels and their rules per activity, in parallel, collecting the progress events
+    prioritization_levels = asyncio.run(
+        discover_priority_rules_async(
+            _read_event_log_3(), ['urgency'], group_by=DEFAULT_CSV_IDS.activity, n_jobs=2, on_progress=events.append
+        )
+    )
+    # Assert the same levels as the synchronous discovery, and one progress event per group
+    assert prioritization_levels == discover_priority_rules(_read_event_log_3(), ['urgency'], group_by=DEFAULT_CSV_IDS.activity)
+    assert sorted(event['group'] for event in events if event['stage'] == 'group') == ['A', 'B', 'C']
+    assert events[-1]['num_groups'] == 3
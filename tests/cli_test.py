@@ -0,0 +1,72 @@
+import json
+
+from prioritization_discovery.cli import main
+
+
+def test_main(tmp_path):
+    output_path = tmp_path / "rules.json"
+    report_path = tmp_path / "report.json"
+    # Run discovery through the command-line entry point
+    exit_code = main([
+        "./tests/assets/event_log_3.csv",
+        "--attributes", "urgency",
+        "--output", str(output_path),
+        "--report", str(report_path),
+    ])
+    assert exit_code == 0
+    # Assert expected levels and rules
+    with open(output_path) as output_file:
+        assert json.load(output_file) == [
+            {'priority_level': 1, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'high'}]]},
+            {'priority_level': 2, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'medium'}]]}
+        ]
+    # Assert the report contains the runtime and memory statistics
+    with open(report_path) as report_file:
+        report = json.load(report_file)
+    assert report["num_events"] > 0
+    assert report["num_priority_levels"] == 2
+    assert {"read_runtime", "discovery_runtime", "peak_memory_mb", "peak_worker_memory_mb"} <= set(report)
+
+
+def test_main_with_column_mapping_and_budget(tmp_path):
+    # Rename the columns of the event log
+    with open("./tests/assets/event_log_3.csv") as input_file:
+        content = input_file.read().replace("Resource", "resource_id").replace("enabled_time", "ready_time")
+    event_log_path = tmp_path / "event_log.csv"
+    event_log_path.write_text(content)
+    output_path = tmp_path / "rules.json"
+    # Run discovery with the column mapping, limited to one level, and in parallel
+    exit_code = main([
+        str(event_log_path),
+        "--attributes", "urgency",
+        "--output", str(output_path),
+        "--resource", "resource_id",
+        "--enabled-time", "ready_time",
+        "--max-levels", "1",
+        "--n-jobs", "2",
+    ])
+    assert exit_code == 0
+    with open(output_path) as output_file:
+        assert json.load(output_file) == [
+            {'priority_level': 1, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'high'}]]}
+        ]
+
+
+def test_main_grouped(tmp_path):
+    output_path = tmp_path / "rules.json"
+    # Run discovery per resource through the command-line entry point
+    exit_code = main([
+        "./tests/assets/event_log_3.csv",
+        "--attributes", "urgency",
+        "--output", str(output_path),
+        "--group-by", "resource",
+    ])
+    assert exit_code == 0
+    # Assert expected levels and rules of the only resource
+    with open(output_path) as output_file:
+        assert json.load(output_file) == {
+            'Jonathan': [
+                {'priority_level': 1, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'high'}]]},
+                {'priority_level': 2, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'medium'}]]}
+            ]
+        }
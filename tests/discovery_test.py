@@ -1,7 +1,16 @@
+from pathlib import Path
+
 import pandas as pd
+import pytest
 
-from prioritization_discovery.config import DEFAULT_CSV_IDS
-from prioritization_discovery.discovery import _discover_prioritized_instances, _split_to_individual_observations, discover_priority_rules
+from prioritization_discovery.config import DEFAULT_CSV_IDS, WEIGHT_COLUMN
+from prioritization_discovery.discovery import (
+    _discover_observations,
+    _discover_prioritized_instances,
+    _prune_event_log,
+    _split_to_individual_observations,
+    discover_priority_rules,
+)
 
 
 def test_discover_prioritized_instances():
@@ -183,3 +192,228 @@ def test_discover_priority_rules_naive():
             ]
         }
     ]
+
+
+def test_discover_prioritized_instances_spilled(tmp_path):
+    # Read event log
+    event_log = pd.read_csv("./tests/assets/event_log_2.csv")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.end_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.end_time], utc=True)
+    # Discover prioritization spilling to disk in small batches
+    attributes = [DEFAULT_CSV_IDS.activity, 'loan_amount']
+    prioritizations = _discover_prioritized_instances(event_log, attributes, spill_dir=tmp_path, batch_size=3)
+    # Assert the observations have been aggregated by prioritization (both sharing index and weight)
+    assert (prioritizations.index.value_counts() == 2).all()
+    assert (prioritizations.groupby(level=0)[WEIGHT_COLUMN].nunique() == 1).all()
+    # Assert the weighted observations are the same than the non-spilled ones
+    expected = _discover_prioritized_instances(event_log, attributes).value_counts().sort_index()
+    weighted = prioritizations.groupby(['Activity', 'loan_amount', 'outcome'])[WEIGHT_COLUMN].sum().sort_index()
+    assert weighted.tolist() == expected.tolist()
+    assert weighted.index.tolist() == expected.index.tolist()
+    # Assert the temporary files have been removed
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_discover_priority_rules_spilled_weight_attribute(tmp_path):
+    # Read event log with a case attribute named as a typical weight column
+    event_log = pd.read_csv("./tests/assets/event_log_2.csv").rename(columns={'loan_amount': 'weight'})
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    # Assert the attribute keeps its values when spilling (not overwritten by the number of occurrences)
+    prioritizations, weight, _ = _discover_observations(event_log, ['weight'], spill_dir=tmp_path)
+    assert weight == WEIGHT_COLUMN
+    weighted = prioritizations.groupby(['weight', 'outcome'])[WEIGHT_COLUMN].sum().sort_index()
+    assert weighted.to_dict() == _discover_observations(event_log, ['weight'])[0].value_counts().sort_index().to_dict()
+    # Assert the reserved column names cannot be used as attributes
+    with pytest.raises(ValueError):
+        _discover_observations(event_log, [WEIGHT_COLUMN])
+
+
+def test_discover_priority_rules_spilled(tmp_path):
+    # Read event log
+    event_log = pd.read_csv("./tests/assets/event_log_3.csv")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    # Get priority levels and their rules spilling to disk
+    stats = {}
+    prioritization_levels = discover_priority_rules(event_log, ['urgency'], spill_dir=tmp_path, batch_size=2, stats=stats)
+    # Assert expected levels and rules, and the (non-aggregated) number of observations
+    assert prioritization_levels == [
+        {'priority_level': 1, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'high'}]]},
+        {'priority_level': 2, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'medium'}]]}
+    ]
+    assert stats["num_observations"] == len(_discover_prioritized_instances(event_log, ['urgency']))
+
+
+def test_discover_prioritized_instances_duckdb(tmp_path, monkeypatch):
+    duckdb = pytest.importorskip("duckdb")
+    # Read event log
+    event_log = pd.read_csv("./tests/assets/event_log_2.csv")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.end_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.end_time], utc=True)
+    # Discover prioritization with both backends (from an empty working directory, recording the DuckDB configuration)
+    monkeypatch.chdir(tmp_path)
+    configs, connect = [], duckdb.connect
+    monkeypatch.setattr(duckdb, "connect", lambda *args, **kwargs: configs.append(kwargs["config"]) or connect(*args, **kwargs))
+    attributes = [DEFAULT_CSV_IDS.activity, 'loan_amount']
+    sqlite_prioritizations = _discover_prioritized_instances(event_log, attributes)
+    duckdb_prioritizations = _discover_prioritized_instances(event_log, attributes, backend="duckdb")
+    # Assert the same observations have been found (the order of the pairs is not deterministic)
+    assert sorted(duckdb_prioritizations.itertuples(index=False)) == sorted(sqlite_prioritizations.itertuples(index=False))
+    # Assert both observations of each prioritization share the index
+    assert (duckdb_prioritizations.index.value_counts() == 2).all()
+    # Assert DuckDB spilled to a temporary directory (removed afterwards) instead of the current working directory
+    [config] = configs
+    assert not Path(config["temp_directory"]).exists()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_discover_priority_rules_duckdb_spilled(tmp_path):
+    pytest.importorskip("duckdb")
+    # Read event log
+    event_log = pd.read_csv("./tests/assets/event_log_3.csv")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    # Get priority levels and their rules with DuckDB spilling to disk
+    prioritization_levels = discover_priority_rules(
+        event_log, ['urgency'], spill_dir=tmp_path, batch_size=2, backend="duckdb"
+    )
+    # Assert expected levels and rules
+    assert prioritization_levels == [
+        {'priority_level': 1, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'high'}]]},
+        {'priority_level': 2, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'medium'}]]}
+    ]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_discover_priority_rules_quality():
+    # Read event log
+    event_log = pd.read_csv("./tests/assets/event_log_3.csv")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    # Get priority levels and their rules with their quality
+    prioritization_levels = discover_priority_rules(event_log, ['urgency'], quality=True)
+    # Assert the quality of each level
+    assert [level['quality'] for level in prioritization_levels] == [
+        {'support': 0.25, 'confidence': 1.0, 'lift': 2.0, 'covered_prioritized': 8, 'covered_delayed': 0},
+        {'support': 0.5, 'confidence': 1.0, 'lift': 2.0, 'covered_prioritized': 8, 'covered_delayed': 0}
+    ]
+
+
+def test_prune_event_log():
+    # Build event log with instances enabled and started at different times in two resources
+    event_log = pd.DataFrame(
+        data=[
+            ['R1', '2023-01-01T10:00:00', '2023-01-01T10:00:00'],  # Started on enablement, before the next ones
+            ['R1', '2023-01-01T11:00:00', '2023-01-01T14:00:00'],  # Delayed by the next one
+            ['R1', '2023-01-01T12:00:00', '2023-01-01T13:00:00'],  # Prioritized over the previous one
+            ['R1', '2023-01-01T12:00:00', '2023-01-01T15:00:00'],  # Waiting interval overlapping but not contained
+            ['R2', '2023-01-01T11:30:00', '2023-01-01T11:45:00'],  # Different resource
+            ['R1', '2023-01-01T16:00:00', None],  # Not started
+        ],
+        index=[5, 4, 3, 2, 1, 0],
+        columns=[DEFAULT_CSV_IDS.resource, DEFAULT_CSV_IDS.enabled_time, DEFAULT_CSV_IDS.start_time]
+    )
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    # Assert only the delayed and prioritized instances are kept
+    assert _prune_event_log(event_log).index.tolist() == [4, 3]
+
+
+def test_discover_priority_rules_pruned():
+    # Read event log
+    event_log = pd.read_csv("./tests/assets/event_log_3.csv")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    # Get priority levels and their rules with and without pruning the event log
+    stats = {}
+    pruned_levels = discover_priority_rules(event_log, ['urgency'], quality=True, stats=stats)
+    assert pruned_levels == discover_priority_rules(event_log, ['urgency'], quality=True, prune=False)
+    assert stats['num_pruned_events'] == 4
+
+
+def test_discover_priority_rules_grouped():
+    # Read event log
+    event_log = pd.read_csv("./tests/assets/event_log_3.csv")
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    # Get priority levels and their rules per resource (only one), in parallel
+    stats = {}
+    prioritization_levels = discover_priority_rules(
+        event_log, ['urgency'], group_by=DEFAULT_CSV_IDS.resource, n_jobs=2, stats=stats
+    )
+    assert prioritization_levels == {
+        'Jonathan': [
+            {'priority_level': 1, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'high'}]]},
+            {'priority_level': 2, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'medium'}]]}
+        ]
+    }
+    assert stats['num_groups'] == 1
+    # Get priority levels and their rules per activity
+    prioritization_levels = discover_priority_rules(event_log, ['urgency'], group_by=DEFAULT_CSV_IDS.activity, n_jobs=2)
+    assert list(prioritization_levels) == ['A', 'B', 'C']
+    assert all(
+        condition['attribute'] == 'urgency'
+        for levels in prioritization_levels.values()
+        for level in levels
+        for rule in level['rules']
+        for condition in rule
+    )
+
+
+def test_discover_priority_rules_grouped_by_prioritized_activity():
+    # Build event log where the instances of X are always delayed by the ones of Y
+    event_log = pd.DataFrame(
+        data=[
+            ['R1', 'X', 'low', '2023-01-01T10:00:00', '2023-01-01T13:00:00'],
+            ['R1', 'Y', 'high', '2023-01-01T11:00:00', '2023-01-01T12:00:00'],
+            ['R1', 'X', 'low', '2023-01-02T10:00:00', '2023-01-02T13:00:00'],
+            ['R1', 'Y', 'high', '2023-01-02T11:00:00', '2023-01-02T12:00:00'],
+        ],
+        columns=[
+            DEFAULT_CSV_IDS.resource,
+            DEFAULT_CSV_IDS.activity,
+            'urgency',
+            DEFAULT_CSV_IDS.enabled_time,
+            DEFAULT_CSV_IDS.start_time,
+        ]
+    )
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    # Assert the prioritizations are kept together in the group of Y, sequentially and in parallel
+    for n_jobs in [1, 2]:
+        assert discover_priority_rules(
+            event_log, ['urgency'], group_by=DEFAULT_CSV_IDS.activity, n_jobs=n_jobs, tune=True
+        ) == {'Y': [{'priority_level': 1, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'high'}]]}]}
+
+
+def test_discover_priority_rules_grouped_covered_level():
+    # Build event log where, once the first level is discovered, the remaining prioritization of X cannot be told apart
+    event_log = pd.DataFrame(
+        data=[
+            ['R1', 'X', 'low', '2023-01-01T10:00:00', '2023-01-01T13:00:00'],
+            ['R1', 'X', 'high', '2023-01-01T11:00:00', '2023-01-01T12:00:00'],
+            ['R1', 'Z', 'low', '2023-01-01T20:00:00', '2023-01-01T23:00:00'],
+            ['R1', 'X', 'low', '2023-01-01T21:00:00', '2023-01-01T22:00:00'],
+        ],
+        columns=[
+            DEFAULT_CSV_IDS.resource,
+            DEFAULT_CSV_IDS.activity,
+            'urgency',
+            DEFAULT_CSV_IDS.enabled_time,
+            DEFAULT_CSV_IDS.start_time,
+        ]
+    )
+    event_log[DEFAULT_CSV_IDS.enabled_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.enabled_time], utc=True)
+    event_log[DEFAULT_CSV_IDS.start_time] = pd.to_datetime(event_log[DEFAULT_CSV_IDS.start_time], utc=True)
+    # Assert the levels of X are discovered, sequentially and in parallel
+    for n_jobs in [1, 2]:
+        prioritization_levels = discover_priority_rules(
+            event_log, ['urgency'], group_by=DEFAULT_CSV_IDS.activity, n_jobs=n_jobs, tune=True
+        )
+        assert list(prioritization_levels) == ['X']
+        assert prioritization_levels['X'][0] == {
+            'priority_level': 1, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'high'}]]
+        }
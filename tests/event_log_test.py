@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from prioritization_discovery.config import DEFAULT_CSV_IDS
+from prioritization_discovery.discovery import discover_priority_rules
+from prioritization_discovery.event_log import read_event_log
+
+
+def test_read_event_log_csv():
+    # Read the event log with only the needed columns
+    event_log = read_event_log("./tests/assets/event_log_2.csv", ['loan_amount'])
+    # Assert the columns have been projected and parsed at read time
+    assert set(event_log.columns) == {'Resource', 'enabled_time', 'start_time', 'loan_amount'}
+    assert isinstance(event_log['Resource'].dtype, pd.CategoricalDtype)
+    assert str(event_log[DEFAULT_CSV_IDS.enabled_time].dt.tz) == "UTC"
+    assert str(event_log[DEFAULT_CSV_IDS.start_time].dt.tz) == "UTC"
+
+
+def test_read_event_log_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    # Store the event log as Parquet
+    parquet_path = tmp_path / "event_log.parquet"
+    pd.read_csv("./tests/assets/event_log_2.csv").to_parquet(parquet_path)
+    # Read the event log with only the needed columns
+    event_log = read_event_log(parquet_path, [DEFAULT_CSV_IDS.activity, 'loan_amount'])
+    # Assert the columns have been projected and converted to their compact types
+    assert list(event_log.columns) == ['Resource', 'enabled_time', 'start_time', 'Activity', 'loan_amount']
+    assert isinstance(event_log['Resource'].dtype, pd.CategoricalDtype)
+    assert isinstance(event_log['Activity'].dtype, pd.CategoricalDtype)
+    assert event_log['loan_amount'].dtype == "int64"
+    assert str(event_log[DEFAULT_CSV_IDS.enabled_time].dt.tz) == "UTC"
+    # Assert the timestamps are the same than the ones parsed from the CSV
+    csv_event_log = read_event_log("./tests/assets/event_log_2.csv", ['loan_amount'])
+    assert event_log[DEFAULT_CSV_IDS.start_time].equals(csv_event_log[DEFAULT_CSV_IDS.start_time])
+
+
+def test_discover_priority_rules_from_arrow(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    # Read event log and store it as Parquet and Arrow table
+    event_log = pd.read_csv("./tests/assets/event_log_3.csv")
+    parquet_path = tmp_path / "event_log.parquet"
+    event_log.to_parquet(parquet_path)
+    table = pa.Table.from_pandas(event_log)
+    # Get priority levels and their rules from both sources
+    expected = [
+        {'priority_level': 1, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'high'}]]},
+        {'priority_level': 2, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'medium'}]]}
+    ]
+    assert discover_priority_rules(parquet_path, ['urgency']) == expected
+    assert discover_priority_rules(table, ['urgency']) == expected
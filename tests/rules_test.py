@@ -1,6 +1,11 @@
 import pandas as pd
 
-from prioritization_discovery.rules import discover_prioritization_rules, _reverse_one_hot_encoding
+from prioritization_discovery.rules import (
+    TUNING_TOLERANCE,
+    discover_prioritization_rules,
+    _fit_tree_rules,
+    _reverse_one_hot_encoding,
+)
 
 
 def test_discover_prioritization_rules():
@@ -42,6 +47,120 @@ def test_discover_prioritization_rules():
     ]
 
 
+def test_discover_prioritization_rules_parallel():
+    # Given a set of prioritizations
+    prioritizations = pd.DataFrame(
+        data=[["B", 0], ["B", 0], ["B", 0], ["C", 1], ["C", 1], ["C", 1]],
+        index=[0, 1, 2, 0, 1, 2],
+        columns=["Activity", "outcome"],
+    )
+    # Discover their rules fitting the trees in worker processes
+    prioritization_rules = discover_prioritization_rules(prioritizations, "outcome", n_jobs=2)
+    # Assert the rules
+    assert prioritization_rules == [
+        {
+            'priority_level': 1,
+            'rules': [
+                [
+                    {
+                        'attribute': 'Activity',
+                        'comparison': '=',
+                        'value': 'C'
+                    }
+                ]
+            ]
+        }
+    ]
+
+
+def test_discover_prioritization_rules_tuned():
+    # Given a set of prioritizations (multiplied to have enough population)
+    data = [["B", 100, 0], ["C", 500, 1], ["B", 200, 0], ["C", 700, 1]] * 50
+    indices = [index // 2 for index in range(len(data))]
+    prioritizations = pd.DataFrame(data=data, index=indices, columns=["Activity", "loan_amount", "outcome"])
+    # Discover their rules tuning the decision trees, sequentially and in parallel
+    param_grid = {"max_depth": [None, 1], "min_weight_fraction_leaf": [0.0, 0.1]}
+    for n_jobs in [1, 2]:
+        stats = {}
+        prioritization_rules = discover_prioritization_rules(
+            prioritizations, "outcome", n_jobs=n_jobs, tune=True, param_grid=param_grid, stats=stats
+        )
+        # Assert the rules, and the reported tuning
+        assert len(prioritization_rules) == 1
+        assert stats["tree_params"]["max_depth"] in [None, 1]
+        assert stats["tree_params"]["min_weight_fraction_leaf"] in [0.0, 0.1]
+        assert stats["tuning_runtime"] > 0
+
+
+def test_discover_prioritization_rules_tuned_prefers_simpler_rules():
+    # Given a set of prioritizations where one condition (x > 5 or y > 5) is almost as confident as both of them
+    data = [[1, 1, 0], [9, 9, 1]] * 300 + [[9, 1, 0], [9, 9, 1], [1, 9, 0], [9, 9, 1]]
+    indices = [index // 2 for index in range(len(data))]
+    prioritizations = pd.DataFrame(data=data, index=indices, columns=["x", "y", "outcome"])
+    param_grid = {"max_depth": [None, 1]}
+    # Assert the deepest tree leads to (slightly) more confident rules with more conditions
+    [deep_level] = discover_prioritization_rules(
+        prioritizations, "outcome", tune=True, param_grid={"max_depth": [None]}, quality=True
+    )
+    [shallow_level] = discover_prioritization_rules(
+        prioritizations, "outcome", tune=True, param_grid={"max_depth": [1]}, quality=True
+    )
+    assert len(deep_level["rules"][0]) == 2 and len(shallow_level["rules"][0]) == 1
+    assert 0 < deep_level["quality"]["confidence"] - shallow_level["quality"]["confidence"] < TUNING_TOLERANCE
+    # Assert the simpler rules are chosen when tuning, as their confidence is within the tolerance
+    stats = {}
+    discover_prioritization_rules(prioritizations, "outcome", tune=True, param_grid=param_grid, stats=stats)
+    assert stats["tree_params"] == {"max_depth": 1}
+    # Assert the deepest tree is chosen when the simpler rules are far less confident
+    data += data[-4:] * 15
+    indices = [index // 2 for index in range(len(data))]
+    prioritizations = pd.DataFrame(data=data, index=indices, columns=["x", "y", "outcome"])
+    stats = {}
+    discover_prioritization_rules(prioritizations, "outcome", tune=True, param_grid=param_grid, stats=stats)
+    assert stats["tree_params"] == {"max_depth": None}
+
+
+def test_discover_prioritization_rules_tuned_few_prioritizations():
+    # Given a single prioritization (not enough to cross-validate)
+    prioritizations = pd.DataFrame(data=[["A", 1], ["B", 0]], index=[0, 0], columns=["Activity", "outcome"])
+    # Assert the rules are discovered with the default hyperparameters
+    stats = {}
+    prioritization_rules = discover_prioritization_rules(prioritizations, "outcome", tune=True, stats=stats)
+    assert prioritization_rules == [
+        {'priority_level': 1, 'rules': [[{'attribute': 'Activity', 'comparison': '=', 'value': 'A'}]]}
+    ]
+    assert stats["tree_params"] == {}
+
+
+def test_discover_prioritization_rules_only_prioritized_left():
+    # Given a set of observations where, once the first level is discovered, only prioritized observations are left
+    prioritizations = pd.DataFrame(
+        data=[["high", 1], ["low", 0], ["low", 1]], index=[0, 0, 1], columns=["urgency", "outcome"]
+    )
+    # Assert the search ends after the first level, sequentially and in parallel
+    for n_jobs in [1, 2]:
+        assert discover_prioritization_rules(prioritizations, "outcome", n_jobs=n_jobs) == [
+            {'priority_level': 1, 'rules': [[{'attribute': 'urgency', 'comparison': '=', 'value': 'high'}]]}
+        ]
+    # Assert no levels are discovered when there are no delayed observations at all
+    assert discover_prioritization_rules(prioritizations[prioritizations["outcome"] == 1], "outcome") == []
+
+
+def test__fit_tree_rules_aggregated():
+    # Given a set of observations, and the same ones aggregated with their number of occurrences as weight
+    observations = pd.DataFrame(data=[[1, 0]] * 20 + [[9, 1]] * 20 + [[5, 1]], columns=["x", "outcome"])
+    aggregated = pd.DataFrame(data=[[1, 0, 20], [9, 1, 20], [5, 1, 1]], columns=["x", "outcome", "weight"])
+    # Assert the leaf size as a fraction of the weight leads to the same rules in both
+    tree_params = {"min_weight_fraction_leaf": 0.1}
+    rules = _fit_tree_rules(observations[["x"]], observations["outcome"], tree_params=tree_params)
+    assert rules == [[{'attribute': 'x', 'comparison': '>', 'value': '3.0'}]]
+    assert _fit_tree_rules(aggregated[["x"]], aggregated["outcome"], aggregated["weight"], tree_params=tree_params) == rules
+    # Assert the leaf size as a number of observations does not (the aggregated ones are too few to split)
+    tree_params = {"min_samples_leaf": 5}
+    assert _fit_tree_rules(observations[["x"]], observations["outcome"], tree_params=tree_params) == rules
+    assert _fit_tree_rules(aggregated[["x"]], aggregated["outcome"], aggregated["weight"], tree_params=tree_params) != rules
+
+
 def test_discover_prioritization_rules_with_extra_attribute():
     # Given a set of prioritizations
     prioritizations = pd.DataFrame(
@@ -0,0 +1,40 @@
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from prioritization_discovery.shared import SharedObservations, call_with_shared_observations
+
+
+def _summarize(observations, factor):
+    return observations.features.sum() * factor, observations.labels.tolist(), observations.weights
+
+
+def test_shared_observations():
+    data = pd.DataFrame(
+        {
+            'loan_amount': [100, 500, 1000, 50],
+            'urgency_high': [True, False, True, False],
+            'outcome': [1, 0, 1, 0],
+        }
+    )
+    with SharedObservations(data, ['loan_amount', 'urgency_high'], 'outcome') as shared:
+        handle = shared.handle
+        # Attach to the shared observations by handle
+        assert call_with_shared_observations(handle, _summarize, 2) == (3304.0, [1, 0, 1, 0], None)
+        # Compact the active observations into new blocks
+        shared.set_active(np.array([True, True, False, False]))
+        level_handle = shared.handle
+        assert level_handle.features.shape == (2, 2)
+        assert call_with_shared_observations(level_handle, _summarize, 1) == (601.0, [1, 0], None)
+        # Assert the compacted blocks of the previous level are removed in the next one
+        shared.set_active(np.array([False, True, True, True]))
+        assert call_with_shared_observations(shared.handle, _summarize, 1) == (1551.0, [0, 1, 0], None)
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=level_handle.features.name)
+        # Closing explicitly before exiting the context is allowed
+        shared.close()
+    # Assert the shared memory blocks have been removed
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=handle.features.name)